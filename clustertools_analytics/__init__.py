@@ -4,7 +4,7 @@ from .array.latex import LatexFormater, LatexColorFormater, \
     LatexColumnColorFormater, LatexRowColorFormater
 from .array.colorer import LinearColorer, OrdinalColorer
 
-from .utils import EmptyCube, save_pdf, PDFSaver
+from .utils import EmptyCube, SelectedCube, save_pdf, PDFSaver
 from .plot.convention import Convention, ConventionFactory, default_factory, \
     OverrideConventionFactory
 from .plot.layout import Subplot, HzSubplot, TwoLegendPlot
@@ -12,14 +12,21 @@ from .plot.plot import Plot2D, ScatterPlot, \
     TrajectoryPlot, BarPlot, ScatterSpaceHz, HorizontalLine, HistogramPlot, \
     BoxPlot, VerticalLine, DispersionEllipse
 from .plot.trajectory import TrajectoryDisplayer, MinMaxMeanTrajectory, \
-    StdBarTrajectory
+    StdBarTrajectory, DensityTrajectory
 from .plot.decorators import TextDecorator, LegendDecorator, GridDecorator, \
     LimitDecorator, SameLimitDecorator, TimeConverter, TightLayout
 from .accessor import Accessor, NumpyfySqueeze, MetricOverParameter, \
     name_to_accessor, DiffAccessor, DomainAccessor, YSeriesXRangeAccessor, \
     XSeriesYSeries, AtomicAcessor, SeriesAccessor, YSeriesByParamOverParams, \
-    DeltaSeries, MedianFilteredSeries, SamplingSeries, InterpXYSeries
+    DeltaSeries, MedianFilteredSeries, SamplingSeries, InterpXYSeries, \
+    ChunkedSeries, MissingValuesWarning, SeriesMoments, MomentsOverParameter, \
+    Plan, evaluate_fused, Select
+from .kernels import Moments, RaggedSeries
+from .labelled import LabelledArray
 from .plot.widget import Legend
+from .cache import AccessorCache, DiskCache, get_cache, set_cache
+from .profiling import Profiler, get_profiler, set_profiler
+from .precision import get_default_dtype, set_default_dtype
 
 
 __author__ = "Begon Jean-Michel <jm.begon@gmail.com>"
@@ -38,12 +45,20 @@ __all__ = ["Formater", "TSVFormater", "CSVFormater", "LatexFormater",
            "TrajectoryPlot", "BarPlot", "ScatterSpaceHz", "HorizontalLine",
            "HistogramPlot", "Subplot", "BoxPlot",
            "TrajectoryDisplayer", "MinMaxMeanTrajectory", "StdBarTrajectory",
+           "DensityTrajectory",
            "TextDecorator", "LegendDecorator", "GridDecorator",
            "LimitDecorator", "SameLimitDecorator", "TimeConverter",
            "Accessor", "NumpyfySqueeze", "MetricOverParameter",
            "name_to_accessor", "DiffAccessor", "DomainAccessor",
            "XSeriesYSeries", "AtomicAcessor", "SeriesAccessor",
            "YSeriesXRangeAccessor", "YSeriesByParamOverParams", "DeltaSeries",
-           "MedianFilteredSeries", "SamplingSeries",
+           "MedianFilteredSeries", "SamplingSeries", "ChunkedSeries",
+           "SeriesMoments", "MomentsOverParameter", "Moments", "RaggedSeries",
+           "Plan", "evaluate_fused", "Select", "SelectedCube",
+           "LabelledArray",
+           "MissingValuesWarning",
            "EmptyCube", "save_pdf", "PDFSaver", "VerticalLine",
-           "Legend", "InterpXYSeries", "DispersionEllipse"]
+           "Legend", "InterpXYSeries", "DispersionEllipse",
+           "AccessorCache", "DiskCache", "get_cache", "set_cache",
+           "Profiler", "get_profiler", "set_profiler",
+           "get_default_dtype", "set_default_dtype"]
@@ -1,11 +1,24 @@
 import warnings
+import weakref
 from abc import ABCMeta
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
 from functools import partial
 
 import numpy as np
 
 from clustertools import Datacube
 
+from .cache import get_cache, set_cache, no_cache, describe_accessor, \
+    describe_value
+from .kernels import interp_rows, running_median, lttb, \
+    minmax_envelope, Moments, RaggedSeries, interp_ragged, longest_xs
+from .precision import get_default_dtype, set_default_dtype, resolve_dtype
+from .profiling import get_profiler, set_profiler
+from .labelled import LabelledArray
+from .utils import SelectedCube
+
 
 def name_to_accessor(metric_accessor):
     if isinstance(metric_accessor, str):
@@ -13,20 +26,522 @@ def name_to_accessor(metric_accessor):
     return metric_accessor
 
 
+_shared_loads = None
+
+
+@contextmanager
+def shared_loads():
+    """
+    Within the block, the numpyfied metrics of a cube (see `load`) are
+    loaded once and shared by all the accessors
+    """
+    global _shared_loads
+    if _shared_loads is not None:
+        # Already sharing
+        yield
+        return
+    _shared_loads = {}
+    try:
+        yield
+    finally:
+        _shared_loads = None
+
+
+def load(cube, metric_name):
+    """
+    Return `cube(metric_name).numpyfy(True)` as an array, loaded only once
+    per cube within a `shared_loads` block (the array is then read-only)
+    """
+    if _shared_loads is None:
+        return np.asarray(cube(metric_name).numpyfy(True))
+
+    key = id(cube), metric_name
+    entry = _shared_loads.get(key)
+    if entry is None:
+        block = np.asarray(cube(metric_name).numpyfy(True)).view()
+        block.flags.writeable = False
+        # The cube is referenced so that its identity cannot be reused
+        entry = _shared_loads[key] = cube, block
+    return entry[1]
+
+
+_views = {}
+
+
+def _memoized_view(cube, key, make_view):
+    """
+    Return `make_view()`, memoized on the identity of `cube` and `key` so
+    that a cube always gives the same view (see `cache.AccessorCache`).
+
+    Only weak references are kept: a view is forgotten once nothing uses it
+    anymore (e.g. a cache entry) or once its cube is gone.
+    """
+    key = id(cube), key
+    entry = _views.get(key)
+    if entry is not None:
+        cube_ref, view_ref = entry
+        view = view_ref()
+        if view is not None and cube_ref() is cube:
+            return view
+    view = make_view()
+
+    def forget(_):
+        if _views.get(key) is entry:
+            del _views[key]
+
+    try:
+        entry = weakref.ref(cube, forget), weakref.ref(view, forget)
+    except TypeError:
+        # Not weakly referenceable: not memoized
+        return view
+    _views[key] = entry
+    return view
+
+
+def union_metric_names(accessors):
+    """
+    Union of the metrics read by the `accessors` (None if one of them does
+    not declare them, see `Accessor.metric_names`)
+    """
+    names = set()
+    for accessor in accessors:
+        metric_names = getattr(accessor, "metric_names", None)
+        accessor_names = None if metric_names is None else metric_names()
+        if accessor_names is None:
+            return None
+        names.update(accessor_names)
+    return frozenset(names)
+
+
+def project(cube, metric_names):
+    """
+    Return `cube` restricted to the `metric_names` (None for all of them),
+    so that the other metrics are never loaded.
+
+    The projections are memoized (on the identity of the cube), so that a
+    cube is always projected to the same cube (see `cache.AccessorCache`).
+    """
+    if not metric_names:
+        return cube
+    metrics = getattr(cube, "metrics", None)
+    if metrics is None:
+        return cube
+    kept = tuple(m for m in metrics if m in metric_names)
+    if len(kept) == 0 or len(kept) == len(metrics):
+        return cube
+
+    def make_view():
+        try:
+            projected = cube(*kept)
+        except Exception:
+            return cube
+        return projected if is_cube(projected) else cube
+
+    return _memoized_view(cube, ("project", kept), make_view)
+
+
+def select(cube, **selections):
+    """
+    Return the view of `cube` restricted to the selected parameter values
+    (see `utils.SelectedCube`), memoized as the projections are
+    """
+    selections = OrderedDict((p, as_values(v))
+                             for p, v in sorted(selections.items()))
+    key = ("select",) + tuple(selections.items())
+    return _memoized_view(cube, key,
+                          lambda: SelectedCube(cube, selections))
+
+
+def as_values(values):
+    """The tuple of the `values` (a single value or an iterable thereof)"""
+    if isinstance(values, (str, bytes)) or not hasattr(values, "__iter__"):
+        return values,
+    return tuple(values)
+
+
+def is_cube(obj):
+    return isinstance(obj, (Datacube, SelectedCube))
+
+
+_active_evaluation = None
+
+
+class Evaluation(object):
+    """The results of the nodes of a `Plan` on one cube"""
+    def __init__(self, plan, cube):
+        self.plan = plan
+        self.cube = cube
+        self.results = {}
+
+    def result(self, accessor):
+        """
+        Return the result of `accessor` on the cube (computed once) and
+        whether it may be overwritten (owned)
+        """
+        key = self.plan.key(accessor)
+        if key not in self.plan.nodes:
+            return accessor(self.cube), False
+        if key in self.results:
+            value = self.results[key]
+        else:
+            value = self.results[key] = accessor(self.cube)
+        return value, self.plan.overwritable(key)
+
+
+class Plan(object):
+    """
+    `Plan`
+    ======
+    Expression DAG of accessors. The nodes are identified by their
+    description (`repr`), so that structurally equal sub-accessors (e.g.
+    the baseline of several `DeltaSeries`) are a single node, evaluated once
+    per cube. The edges are given by `Accessor.children`.
+
+    The result of a node consumed only once, by a composite accessor, may
+    be overwritten by its arithmetic if the node owns it (see
+    `Accessor.owns_results`).
+
+    Example
+    -------
+    >>> plan = Plan(DeltaSeries(a, baseline), DeltaSeries(b, baseline))
+    >>> print(plan.explain())
+    >>> delta_a, delta_b = plan.evaluate(cube)
+    """
+    def __init__(self, *accessors):
+        self.roots = accessors
+        self.nodes = OrderedDict()  # Children before parents
+        self.uses = {}
+        for accessor in accessors:
+            self._add(accessor)
+        self.metric_names = union_metric_names(accessors)
+
+    @classmethod
+    def key(cls, accessor):
+        description = describe_accessor(accessor)
+        return ("id", id(accessor)) if description is None else description
+
+    def _add(self, accessor):
+        key = self.key(accessor)
+        self.uses[key] = self.uses.get(key, 0) + 1
+        if key in self.nodes:
+            return
+        for child in accessor.children():
+            self._add(child)
+        self.nodes[key] = accessor
+
+    def overwritable(self, key):
+        return self.uses[key] == 1 and self.nodes[key].owns_results
+
+    def evaluate_owned(self, cube):
+        """
+        Return the pairs (result, owned) of the roots on `cube`, where
+        owned tells whether the result may be overwritten. The cube is first
+        projected on the metrics of the plan.
+        """
+        global _active_evaluation
+        previous = _active_evaluation
+        cube = project(cube, self.metric_names)
+        evaluation = _active_evaluation = Evaluation(self, cube)
+        try:
+            with shared_loads():
+                return [evaluation.result(root) for root in self.roots]
+        finally:
+            _active_evaluation = previous
+
+    def evaluate(self, cube):
+        """Return the tuple of the results of the roots on `cube`"""
+        return tuple(value for value, _ in self.evaluate_owned(cube))
+
+    def explain(self):
+        """Describe the nodes, in evaluation order"""
+        keys = list(self.nodes.keys())
+        lines = []
+        if self.metric_names is not None:
+            lines.append("metrics: {}".format(", ".join(
+                sorted(self.metric_names))))
+        for i, (key, accessor) in enumerate(self.nodes.items()):
+            children = [keys.index(self.key(c)) for c in accessor.children()]
+            notes = []
+            if self.uses[key] > 1:
+                notes.append("shared by {} uses".format(self.uses[key]))
+            overwritten = [j for j in children
+                           if self.overwritable(keys[j])]
+            if len(overwritten) > 0:
+                notes.append("may write in place into {}"
+                             "".format(", ".join("#{}".format(j)
+                                                 for j in overwritten)))
+            lines.append("#{} {}{}{}".format(
+                i, accessor.__class__.__name__,
+                "" if len(children) == 0 else
+                " <- {}".format(", ".join("#{}".format(j)
+                                          for j in children)),
+                "" if len(notes) == 0 else " ({})".format("; ".join(notes))
+            ))
+            lines.append("    {}".format(key if isinstance(key, str)
+                                         else repr(accessor)))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__,
+                               ", ".join(repr(r) for r in self.roots))
+
+
+def subtract(v1, v2, owned_1=False, owned_2=False, dtype=None):
+    """
+    Return `v1 - v2` (in `dtype` if not None), written into `v1` (or `v2`)
+    if it is owned and a writable array of the result shape and dtype.
+    `LabelledArray` operands are aligned on their labels.
+    """
+    if isinstance(v1, LabelledArray) or isinstance(v2, LabelledArray):
+        difference = v1 - v2
+        if dtype is None:
+            return difference
+        return LabelledArray(difference.values.astype(dtype, copy=False),
+                             difference.dims, difference.coords)
+    if type(v1) is not np.ndarray or type(v2) is not np.ndarray:
+        return v1 - v2 if dtype is None else np.subtract(v1, v2, dtype=dtype)
+
+    shape = np.broadcast_shapes(v1.shape, v2.shape)
+    dtype = np.result_type(v1, v2) if dtype is None else np.dtype(dtype)
+    for v, owned in ((v1, owned_1), (v2, owned_2)):
+        if owned and v.flags.writeable and v.shape == shape and \
+                v.dtype == dtype:
+            return np.subtract(v1, v2, out=v)
+    out = np.empty(shape, dtype=dtype)
+    return np.subtract(v1, v2, out=out)
+
+
+def evaluate_fused(accessors, cube):
+    """
+    Evaluate the `accessors` on `cube` in one pass: each metric is loaded
+    once (see `shared_loads`) and fanned out to all the accessors that need
+    it, and accessors with the same description (including the shared
+    sub-accessors, see `Plan`) are evaluated once.
+
+    Return
+    ------
+    results: tuple
+        The same as `tuple(accessor(cube) for accessor in accessors)`
+    """
+    return Plan(*accessors).evaluate(cube)
+
+
+def gather(cube, metric_name, *parameter_names, squeeze=True, dtype=float):
+    """
+    Numpyfy the metric `metric_name` of `cube` once and move the axes of
+    `parameter_names` to the front.
+
+    Return
+    ------
+    block: np.array [p1, p2, ..., pk, ...] or None
+        The values, where pi is the domain size of the ith parameter of
+        `parameter_names`. The remaining axes are the other parameters (in
+        the cube order) followed by the value axes. If `squeeze`, the
+        trailing singleton axes are dropped (as would do a per-cell
+        `numpyfy(True).squeeze()`).
+        None is returned if the cube cannot be gathered in one block (missing
+        values, ragged metrics, unknown parameters...)
+    """
+    try:
+        domain = cube.domain
+        block = load(cube, metric_name)
+    except Exception:
+        return None
+
+    names = list(domain.keys())
+    if any(p not in names for p in parameter_names):
+        return None
+    shape = tuple(len(domain[p]) for p in names)
+    if block.shape[:len(shape)] != shape:
+        return None
+
+    if block.dtype == object:
+        if any(v is None for v in block.flat):
+            return None
+        try:
+            block = np.array(block.tolist(), dtype=dtype)
+        except (TypeError, ValueError):
+            return None
+    else:
+        block = block.astype(dtype, copy=False)
+
+    front = [names.index(p) for p in parameter_names]
+    back = [i for i in range(block.ndim) if i not in front]
+    block = block.transpose(front + back)
+
+    if squeeze:
+        n = len(front)
+        tail = tuple(d for d in block.shape[n:] if d != 1)
+        block = block.reshape(block.shape[:n] + tail)
+    return block
+
+
+def _evaluate(accessors, cube, default_dtype):
+    # The worker processes do not share the default dtype of the parent.
+    # Forked ones inherit its cache and profiler, which must not be used
+    # there: the parent caches the returned results
+    set_default_dtype(default_dtype)
+    set_cache(None)
+    set_profiler(None)
+    return evaluate_fused(accessors, cube)
+
+
+def _cached_results(cache, accessors, cube):
+    keys = [cache.key(accessor, cube) for accessor in accessors]
+    if any(key is None for key in keys):
+        return None
+    results = []
+    for key in keys:
+        hit, value = cache.get(key)
+        if not hit:
+            return None
+        results.append(value)
+    return tuple(results)
+
+
+def evaluate_in_pool(accessors, cubes, n_jobs=-1):
+    """
+    Evaluate the `accessors` on each of the `cubes` in a pool of `n_jobs`
+    processes (-1 for as many as CPUs). The accessors and cubes must be
+    picklable.
+
+    If an `AccessorCache` is active, it is looked up before submitting a cube
+    and filled with the results, by this process only (the workers run
+    without cache nor profiler).
+
+    Return
+    ------
+    futures: list of `concurrent.futures.Future`
+        The (completed) futures of the tuples of results, in the order of
+        `cubes`. Their `result` method raises the error of the accessor, if
+        any.
+    """
+    cache = get_cache()
+    default_dtype = get_default_dtype()
+    metric_names = union_metric_names(accessors)
+    futures = []
+    submitted = []
+    max_workers = None if n_jobs < 0 else n_jobs
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for cube in cubes:
+            cached = None if cache is None else \
+                _cached_results(cache, accessors, cube)
+            if cached is None:
+                # Only the needed metrics are sent to the workers
+                future = executor.submit(_evaluate, accessors,
+                                         project(cube, metric_names),
+                                         default_dtype)
+                submitted.append(len(futures))
+            else:
+                future = Future()
+                future.set_result(cached)
+            futures.append(future)
+
+    if cache is not None:
+        for i in submitted:
+            if futures[i].exception() is not None:
+                continue
+            cube = cubes[i]
+            results = []
+            for accessor, value in zip(accessors, futures[i].result()):
+                key = cache.key(accessor, cube)
+                if key is not None:
+                    value = cache.put(key, value, cube)
+                results.append(value)
+            futures[i] = Future()
+            futures[i].set_result(tuple(results))
+
+    return futures
+
+
+# Number of accesses in progress (those of the sub-accessors are nested)
+_access_depth = 0
+
+
 class Accessor(object, metaclass=ABCMeta):
+    # The dtype of the floating point results. None follows the default one
+    # (see `precision.set_default_dtype`)
+    dtype = None
+    # Whether the results are freshly allocated arrays, which composite
+    # accessors may overwrite when nothing else uses them (see `Plan`)
+    owns_results = False
+
     def access(self, cube):
         pass
 
+    def get_dtype(self):
+        return resolve_dtype(self.dtype)
+
+    def children(self):
+        """The accessors this one evaluates on the same cube (see `Plan`)"""
+        return ()
+
+    def metric_names(self):
+        """
+        The set of the metrics read by this accessor, or None if unknown
+        (any metric may be read). Composite accessors read the ones of
+        their `children`.
+        """
+        children = self.children()
+        if len(children) == 0:
+            return None
+        return union_metric_names(children)
+
+    def evaluate_children(self, cube):
+        """
+        Evaluate the `children` on `cube` as nodes of the active `Plan` (or
+        of a plan of the children if none is active for `cube`).
+
+        Return
+        ------
+        pairs: list of (result, owned)
+            The result of each child and whether it may be overwritten
+        """
+        evaluation = _active_evaluation
+        if evaluation is None or evaluation.cube is not cube or \
+                Plan.key(self) not in evaluation.plan.nodes:
+            plan = self.__dict__.get("_children_plan")
+            if plan is None:
+                plan = self._children_plan = Plan(*self.children())
+            return plan.evaluate_owned(cube)
+        return [evaluation.result(child) for child in self.children()]
+
     def __call__(self, cube):
         """
         Return an numpy array of appropriate shape based on the `cube`.
+
+        If an `AccessorCache` is active, the result is memoized (see
+        `cache.AccessorCache`). If a `Profiler` is active, the call is
+        recorded (see `profiling.Profiler`).
         """
+        profiler = get_profiler()
+        if profiler is not None:
+            return profiler.measure_call("access", self, cube,
+                                         self.cached_access, cube)
+        return self.cached_access(cube)
+
+    def cached_access(self, cube):
+        global _access_depth
+        cache = get_cache()
+        key = None if cache is None else cache.key(self, cube)
+        if key is not None:
+            hit, value = cache.get(key)
+            if hit:
+                return value
+
+        _access_depth += 1
         try:
-            return self.access(cube)
+            value = self.access(cube)
         except Exception as e:
             raise ValueError("Error with cube '{}' ({})"
                              "".format(cube.name,
                                        self.__class__.__name__)) from e
+        finally:
+            _access_depth -= 1
+
+        if key is not None:
+            value = cache.put(key, value, cube, nested=_access_depth > 0)
+        return value
 
     @property
     def n_outputs(self):
@@ -40,8 +555,12 @@ class NumpyfySqueeze(Accessor):
     def access(self, cube):
         return cube(self.metric_name).numpyfy(True).squeeze()
 
+    def metric_names(self):
+        return frozenset([self.metric_name])
+
     def __repr__(self):
-        return "{}()".format(self.__class__.__name__)
+        return "{}(metric_name={})".format(self.__class__.__name__,
+                                           repr(self.metric_name))
 
 
 class GetByName(Accessor):
@@ -51,52 +570,347 @@ class GetByName(Accessor):
     def access(self, cube):
         return cube(self.metric_name)
 
+    def metric_names(self):
+        return frozenset([self.metric_name])
+
     def __repr__(self):
         return "{}(metric_name={})".format(self.__class__.__name__,
-                                           self.metric_name)
+                                           repr(self.metric_name))
+
+
+class MissingValuesWarning(UserWarning):
+    """
+    Missing values of an accessor over a cube, reported once per access.
+
+    `warnings.warn` formats the message as soon as the warning is issued
+    (even when it is filtered out), so it is kept to a summary of constant
+    size: the counts and the first missing combination only, never the
+    reprs of the cubes. `coordinates` holds the parameter values
+    of every missing combination and `mask` flags them among the `n_cells`
+    combinations (in the iteration order). `describe` lists them all.
+    """
+    def __init__(self, cube_name, accessor, parameter_names, coordinates,
+                 mask):
+        super().__init__()
+        self.cube_name = cube_name
+        self.accessor = accessor
+        self.parameter_names = parameter_names
+        self.coordinates = coordinates
+        self.mask = mask
+
+    @property
+    def n_cells(self):
+        return len(self.mask)
+
+    def __str__(self):
+        first = dict(zip(self.parameter_names, self.coordinates[0]))
+        return "Missing values for {}/{} combinations of {} in cube '{}' " \
+               "({}), e.g. {}".format(len(self.coordinates), self.n_cells,
+                                      repr(self.parameter_names),
+                                      self.cube_name,
+                                      self.accessor.__class__.__name__,
+                                      repr(first))
+
+    def describe(self):
+        lines = ["{} (at {}):".format(self, repr(self.accessor))]
+        for t in self.coordinates:
+            lines.append("    {}".format(repr(dict(zip(self.parameter_names,
+                                                        t)))))
+        return "\n".join(lines)
 
 
 class MetricOverParameter(Accessor):
+    """
+    `MetricOverParameter`
+    =====================
+    Aggregates the metric over the combinations of the parameters.
+
+    Missing combinations are skipped and reported once per access (see
+    `MissingValuesWarning`). If `masked`, they are kept instead (as masked
+    NaNs) so that the result stays rectangular; this requires the default
+    `aggregator`.
+
+    Without custom `aggregator`, the values are gathered in an array of
+    `dtype` (None for the default dtype, see `precision.set_default_dtype`).
+
+    If `labelled`, the result is a `LabelledArray` [p1, ..., pk, ...] whose
+    axes are the parameters (the missing combinations are NaNs, masked if
+    `masked`).
+
+    With an incremental `AccessorCache`, the combinations read by a previous
+    access to a cube of the same name are reused (see `read_cells`); the
+    combinations are then always read one by one, the first access included.
+    """
     def __init__(self, metric_accessor, *parameter_names, aggregator=None,
-                 auto_numpyfy=True):
+                 auto_numpyfy=True, masked=False, dtype=None,
+                 labelled=False):
+        if masked and aggregator is not None:
+            raise ValueError("Cannot mask the result of a custom aggregator")
         self.metric_accessor = name_to_accessor(metric_accessor)
         self.parameter_names = parameter_names
-        self.aggregator = aggregator if aggregator is not None else \
-            partial(np.array, dtype=np.float)
+        self.aggregator = aggregator
         self.auto_numpyfy = auto_numpyfy
+        self.masked = masked
+        self.dtype = dtype
+        self.labelled = labelled
+        # Custom aggregators expect the list of values
+        self.vectorize = aggregator is None
 
-    def access(self, cube):
+    @property
+    def owns_results(self):
+        # Custom aggregators may return anything
+        return self.aggregator is None
+
+    def metric_names(self):
+        return self.metric_accessor.metric_names()
+
+    def aggregate(self, values):
+        if self.aggregator is None:
+            return np.array(values, dtype=self.get_dtype())
+        return self.aggregator(values)
+
+    def access_vectorized(self, cube):
+        """
+        Fast path of `access`: gather all the values from one numpyfied
+        block rather than calling the metric accessor per sub-cube.
+
+        Return
+        ------
+        values: array [n_cells, ...]
+            The values of all the combinations (NaN for the missing ones)
+        missing: list of (int, tuple)
+            The indices and parameter values of the missing combinations
+        or None if the metric accessor or the cube does not allow it.
+        """
+        if not isinstance(self.metric_accessor, (GetByName, NumpyfySqueeze)):
+            return None
+
+        domain = getattr(cube, "domain", None)
+        if domain is None:
+            return None
+
+        squeeze = True
+        if isinstance(self.metric_accessor, GetByName):
+            if set(domain.keys()) - set(self.parameter_names):
+                # The sub-cubes are numpyfied (or refused) by `access`
+                if not self.auto_numpyfy:
+                    return None
+            else:
+                # The sub-cubes are single points: the raw value is taken
+                squeeze = False
+
+        block = gather(cube, self.metric_accessor.metric_name,
+                       *self.parameter_names, squeeze=squeeze,
+                       dtype=self.get_dtype())
+        if block is None:
+            return None
+
+        n = len(self.parameter_names)
+        n_cells = int(np.prod(block.shape[:n], dtype=int))
+        values = np.empty((n_cells,) + block.shape[n:], dtype=block.dtype)
+        values.reshape(block.shape)[...] = block
+
+        # Missing values are numpyfied as NaN: check those cells one by one
+        missing = []
+        flat = values.reshape(n_cells, -1)
+        if flat.shape[1] == 0:
+            return values, missing
+        suspects = set(np.flatnonzero(np.isnan(flat).all(axis=1)).tolist())
+        if len(suspects) == 0:
+            return values, missing
+
+        cells = project(cube, self.metric_names()).iter_dimensions(
+            *self.parameter_names)
+        with no_cache():
+            for i, (t, cube_i) in enumerate(cells):
+                if i not in suspects:
+                    continue
+                v = self.access_cell(cube, cube_i)
+                if v is None:
+                    missing.append((i, t))
+                else:
+                    try:
+                        values[i] = v
+                    except ValueError:
+                        return None
+        return values, missing
+
+    def access_cell(self, cube, cube_i):
+        v = self.metric_accessor(cube_i)
+        if is_cube(v):
+            if self.auto_numpyfy:
+                v = v.numpyfy(True).squeeze()
+            else:
+                raise ValueError("Datacube '{}' is not reduced by {} "
+                                 "".format(cube.name, repr(self)))
+        return v
+
+    def cell_store(self, cube):
+        """
+        The `cache.CellStore` of this accessor over `cube` if an incremental
+        `AccessorCache` is active (see `cache.AccessorCache.cells`)
+        """
+        cache = get_cache()
+        return None if cache is None else cache.cells(self, cube)
+
+    def read_cells(self, cube, store=None):
+        """
+        Read the value of each combination of the parameters.
+
+        With the `cache.CellStore` `store` (see `cell_store`), only the
+        combinations which are new or have changed since the last access to
+        a cube of the same name are read.
+
+        Return
+        ------
+        values: list
+            The value of each combination (None for the missing ones)
+        missing: list of (int, tuple)
+            The indices and parameter values of the missing combinations
+        """
+        cache = get_cache()
         values = []
-        for t, cube_i in cube.iter_dimensions(*self.parameter_names):
-            v = self.metric_accessor(cube_i)
-            if isinstance(v, Datacube):
-                if self.auto_numpyfy:
-                    v = v.numpyfy(True).squeeze()
+        missing = []
+        with no_cache():
+            cells = project(cube, self.metric_names()).iter_dimensions(
+                *self.parameter_names)
+            for i, (t, cube_i) in enumerate(cells):
+                if store is None:
+                    v = self.access_cell(cube, cube_i)
                 else:
-                    raise ValueError("Datacube '{}' is not reduced by {} "
-                                     "".format(cube.name, repr(self)))
+                    fingerprint = cache.fingerprint(cube_i)
+                    v = store.get(t, fingerprint)
+                    if v is not None:
+                        cache.cell_hits += 1
+                    else:
+                        cache.cell_misses += 1
+                        v = self.access_cell(cube, cube_i)
+                        if v is not None:
+                            v = store.put(t, fingerprint, v)
+                if v is None:
+                    missing.append((i, t))
+                values.append(v)
+        if store is not None:
+            cache.put_cells(store)
+        return values, missing
+
+    def report_missing(self, cube, missing, n_cells, stacklevel=3):
+        mask = np.zeros(n_cells, dtype=bool)
+        mask[[i for i, _ in missing]] = True
+        warnings.warn(MissingValuesWarning(cube.name, self,
+                                           self.parameter_names,
+                                           [t for _, t in missing], mask),
+                      stacklevel=stacklevel)
+        return mask
+
+    def mask_missing(self, values, mask):
+        """Mask the rows of `values` flagged in `mask`"""
+        if not isinstance(values, np.ndarray) or len(values) != len(mask):
+            return values
+        mask = mask.reshape((-1,) + (1,) * (values.ndim - 1))
+        return np.ma.masked_array(values,
+                                  mask=np.broadcast_to(mask, values.shape))
+
+    def label(self, cube, values):
+        """The `values` of all the combinations as a `LabelledArray`"""
+        domain = cube.domain
+        coords = OrderedDict((p, domain[p]) for p in self.parameter_names)
+        shape = tuple(len(labels) for labels in coords.values())
+        values = np.asanyarray(values)
+        if not self.masked and np.ma.isMaskedArray(values):
+            values = values.filled(np.nan)
+        return LabelledArray(values.reshape(shape + values.shape[1:]),
+                             self.parameter_names, coords)
+
+    def access(self, cube):
+        values = self.access_values(cube)
+        return self.label(cube, values) if self.labelled else values
+
+    def access_values(self, cube):
+        # Labelled results keep the missing combinations
+        keep_missing = self.masked or self.labelled
+        # An incremental cache reads only the new combinations: the whole
+        # block is not gathered
+        store = self.cell_store(cube)
+        gathered = self.access_vectorized(cube) \
+            if self.vectorize and store is None else None
+
+        if gathered is not None:
+            values, missing = gathered
+            if len(missing) == 0:
+                return values
+            mask = self.report_missing(cube, missing, len(values), 4)
+            if keep_missing:
+                return self.mask_missing(values, mask)
+            return values[~mask]
+
+        values, missing = self.read_cells(cube, store)
+
+        if len(missing) == 0:
+            return self.aggregate(values)
+
+        mask = self.report_missing(cube, missing, len(values), 4)
+        if not keep_missing:
+            return self.aggregate([v for v in values if v is not None])
+
+        present = [v for v in values if v is not None]
+        filler = np.nan if len(present) == 0 else \
+            np.full(np.shape(present[0]), np.nan)
+        values = [filler if v is None else v for v in values]
+        return self.mask_missing(self.aggregate(values), mask)
+
+    def iter_blocks(self, cube, chunk_size):
+        """
+        Yield the aggregated values of (at most) `chunk_size` parameter
+        combinations at a time. The missing ones are skipped and reported
+        once the iteration is over.
+        """
+        values = []
+        missing = []
+        n_cells = 0
+        cells = project(cube, self.metric_names()).iter_dimensions(
+            *self.parameter_names)
+        for t, cube_i in cells:
+            with no_cache():
+                v = self.access_cell(cube, cube_i)
             if v is None:
-                d = {p: v for p,v in zip(self.parameter_names, t)}
-                warnings.warn("Missing values for {} of "
-                              "cube '{}' (at {}): {} from {}"
-                              "".format(repr(d), cube.name, repr(self),
-                                        cube_i, cube))
+                missing.append((n_cells, t))
             else:
                 values.append(v)
-
-        return self.aggregator(values)
+            n_cells += 1
+            if len(values) >= chunk_size:
+                yield self.aggregate(values)
+                values = []
+        if len(values) > 0:
+            yield self.aggregate(values)
+        if len(missing) > 0:
+            self.report_missing(cube, missing, n_cells)
 
     def __repr__(self):
-        return super().__repr__()  # TODO
+        return "{}(metric_accessor={}, parameter_names=*{}, aggregator={}, " \
+               "auto_numpyfy={}, masked={}, dtype={}, labelled={})" \
+               "".format(self.__class__.__name__,
+                         repr(self.metric_accessor),
+                         repr(self.parameter_names),
+                         repr(self.aggregator),
+                         repr(self.auto_numpyfy),
+                         repr(self.masked), repr(self.dtype),
+                         repr(self.labelled))
 
 
 class DiffAccessor(Accessor):
+    owns_results = True
+
     def __init__(self, accessor_1, accessor_2):
         self.accessor_1 = name_to_accessor(accessor_1)
         self.accessor_2 = name_to_accessor(accessor_2)
 
+    def children(self):
+        return self.accessor_1, self.accessor_2
+
     def access(self, cube):
-        return self.accessor_1(cube) - self.accessor_2(cube)
+        (v1, owned_1), (v2, owned_2) = self.evaluate_children(cube)
+        return subtract(v1, v2, owned_1, owned_2)
 
     def __repr__(self):
         return "{}(accessor_1={}, accessor_2={})" \
@@ -104,6 +918,48 @@ class DiffAccessor(Accessor):
                          self.accessor_2)
 
 
+class Select(Accessor):
+    """
+    `Select`
+    ========
+    Evaluates `accessor` on the cube restricted to some values of its
+    parameters, e.g. `Select(accessor, lr=[1e-3, 1e-4], depth=range(3, 8))`.
+    The cube is sliced before any metric is read, so that only the selected
+    results are loaded (see `utils.SelectedCube`). The values are matched
+    against the domain values by their string or float value.
+    """
+    def __init__(self, accessor, **selections):
+        self.accessor = name_to_accessor(accessor)
+        self.selections = OrderedDict((p, as_values(v)) for p, v in
+                                      sorted(selections.items()))
+
+    @property
+    def n_outputs(self):
+        return self.accessor.n_outputs
+
+    @property
+    def owns_results(self):
+        return self.accessor.owns_results
+
+    def metric_names(self):
+        return self.accessor.metric_names()
+
+    def select(self, cube):
+        return select(cube, **self.selections)
+
+    def access(self, cube):
+        return self.accessor(self.select(cube))
+
+    def iter_blocks(self, cube, chunk_size):
+        return self.accessor.iter_blocks(self.select(cube), chunk_size)
+
+    def __repr__(self):
+        return "{}(accessor={}{})".format(
+            self.__class__.__name__, repr(self.accessor),
+            "".join(", {}={}".format(p, repr(v))
+                    for p, v in self.selections.items()))
+
+
 class DomainAccessor(Accessor):
     def __init__(self, parameter_name):
         self.parameter_name = parameter_name
@@ -112,6 +968,9 @@ class DomainAccessor(Accessor):
         return np.array(float(v) for v, _ in
                         cube.iter_dimensions(self.parameter_name))
 
+    def metric_names(self):
+        return frozenset()
+
     def __repr__(self):
         return "{}(parameter_name={})".format(self.__class__.__name__,
                                               self.parameter_name)
@@ -119,8 +978,56 @@ class DomainAccessor(Accessor):
 
 class FirstAccess(MetricOverParameter):
     def access(self, cube):
-        for _, cube_i in cube.iter_dimensions(*self.parameter_names):
-            return self.aggregator(self.metric_accessor(cube_i))
+        cells = project(cube, self.metric_names()).iter_dimensions(
+            *self.parameter_names)
+        with no_cache():
+            for _, cube_i in cells:
+                return self.aggregate(self.metric_accessor(cube_i))
+
+
+class MomentsOverParameter(Accessor):
+    """
+    `MomentsOverParameter`
+    ======================
+    Running statistics (a `kernels.Moments`: count, mean, std, min, max) of
+    the metric over the combinations of the parameters. The values are
+    reduced while iterating over the combinations, `chunk_size` at a time,
+    so that only O(chunk_size * k) values are held (k being the size of a
+    value) instead of the O(n * k) of `MetricOverParameter`.
+
+    The statistics have the (flattened) shape of the metric values ([1] for
+    scalar metrics). Missing combinations are skipped and reported (see
+    `MissingValuesWarning`).
+    The result can be merged with other `Moments` (copy it first if an
+    `AccessorCache` is active: the cached ones are frozen, see
+    `kernels.Moments.frozen`).
+    """
+    def __init__(self, metric_accessor, *parameter_names, chunk_size=64,
+                 auto_numpyfy=True):
+        self.values_accessor = MetricOverParameter(metric_accessor,
+                                                   *parameter_names,
+                                                   auto_numpyfy=auto_numpyfy,
+                                                   dtype=np.float64)
+        self.chunk_size = chunk_size
+
+    def metric_names(self):
+        return self.values_accessor.metric_names()
+
+    def access(self, cube):
+        moments = Moments()
+        for values in self.values_accessor.iter_blocks(cube,
+                                                       self.chunk_size):
+            moments.update(values.reshape(len(values), -1))
+        return moments
+
+    def __repr__(self):
+        return "{}(metric_accessor={}, parameter_names=*{}, chunk_size={}, " \
+               "auto_numpyfy={})" \
+               "".format(self.__class__.__name__,
+                         repr(self.values_accessor.metric_accessor),
+                         repr(self.values_accessor.parameter_names),
+                         repr(self.chunk_size),
+                         repr(self.values_accessor.auto_numpyfy))
 
 
 class SeriesAccessor(Accessor, metaclass=ABCMeta):
@@ -146,6 +1053,107 @@ class SeriesAccessor(Accessor, metaclass=ABCMeta):
             yss = yss[np.newaxis, ...]
         return xs, yss
 
+    def iter_blocks(self, cube, chunk_size):
+        """
+        Yield the (xs, yss_chunk) blocks of at most `chunk_size` series.
+        By default, the whole yss is yielded at once: streaming accessors
+        override this.
+        """
+        yield self(cube)
+
+
+class SeriesBlocks(object):
+    """
+    Lazy iterable over the (xs, yss_chunk) blocks of the series of `cube`
+    (see `SeriesAccessor.iter_blocks`)
+    """
+    def __init__(self, accessor, cube, chunk_size):
+        self.accessor = accessor
+        self.cube = cube
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for xs, yss in self.accessor.iter_blocks(self.cube, self.chunk_size):
+            if yss.ndim == 1:
+                yss = yss[np.newaxis, ...]
+            yield xs, yss
+
+
+class ChunkedSeries(SeriesAccessor):
+    """
+    `ChunkedSeries`
+    ===============
+    Streaming variant of the decorated `SeriesAccessor`: it returns a
+    `SeriesBlocks`, which yields the (xs, yss_chunk) blocks of at most
+    `chunk_size` series, instead of the whole (xs, yss) pair. The full
+    [n, k] matrix is never materialized (provided the decorated accessor
+    supports streaming).
+
+    The trajectory displayers consume those blocks with incremental
+    reductions.
+    """
+    def __init__(self, decorated, chunk_size=256):
+        self.decorated = decorated
+        self.chunk_size = chunk_size
+
+    def __call__(self, cube):
+        return Accessor.__call__(self, cube)
+
+    def access(self, cube):
+        return SeriesBlocks(self.decorated, cube, self.chunk_size)
+
+    def metric_names(self):
+        return self.decorated.metric_names()
+
+    def iter_blocks(self, cube, chunk_size):
+        return self.decorated.iter_blocks(cube, chunk_size)
+
+    def __repr__(self):
+        return "{}(decorated={}, chunk_size={})" \
+               "".format(self.__class__.__name__, repr(self.decorated),
+                         repr(self.chunk_size))
+
+
+class SeriesMoments(SeriesAccessor):
+    """
+    `SeriesMoments`
+    ===============
+    Reduces the series of the decorated `SeriesAccessor` while streaming
+    them (see `SeriesAccessor.iter_blocks`) and returns the pair
+
+    xs: np.array [k]
+        The abscissa
+    moments: `kernels.Moments`
+        The running statistics (count, mean, std, min, max) [k] of the n
+        series
+
+    Only O(chunk_size * k) values are held (provided the decorated accessor
+    supports streaming). The trajectory displayers draw the moments directly.
+    """
+    def __init__(self, decorated, chunk_size=256):
+        self.decorated = decorated
+        self.chunk_size = chunk_size
+
+    def __call__(self, cube):
+        return Accessor.__call__(self, cube)
+
+    def metric_names(self):
+        return self.decorated.metric_names()
+
+    def access(self, cube):
+        xs = None
+        moments = Moments()
+        for block_xs, yss in self.decorated.iter_blocks(cube,
+                                                        self.chunk_size):
+            moments.update(yss)
+            xs = longest_xs(xs, block_xs, yss)
+        return xs, moments
+
+    def __repr__(self):
+        return "{}(decorated={}, chunk_size={})" \
+               "".format(self.__class__.__name__, repr(self.decorated),
+                         repr(self.chunk_size))
+
 
 class YSeriesXRangeAccessor(SeriesAccessor):
     """
@@ -158,81 +1166,161 @@ class YSeriesXRangeAccessor(SeriesAccessor):
     yss: np.array [n, k]
         n series of k values, where n=p1 * p2 * ..., the domain of the
         parameters to synthesize
+
+    If `ragged`, the series may have different lengths (e.g. early-stopped
+    runs): yss is then a `kernels.RaggedSeries` (the trajectory displayers
+    and `InterpXYSeries` consume it, but not the other series decorators).
     """
-    def __init__(self, y_name, *parameter_names):
+    def __init__(self, y_name, *parameter_names, dtype=None, ragged=False):
+        self.dtype = dtype
+        self.ragged = ragged
+        aggregator = partial(RaggedSeries.from_rows, dtype=dtype) \
+            if ragged else None
         self.y_accessor = MetricOverParameter(y_name, *parameter_names,
-                                              aggregator=None,
-                                              auto_numpyfy=False)
+                                              aggregator=aggregator,
+                                              auto_numpyfy=False,
+                                              dtype=dtype)
 
     def __repr__(self):
-        return "{}(y_name={}, parameter_names=*{})" \
+        return "{}(y_name={}, parameter_names=*{}, dtype={}, ragged={})" \
                "".format(self.__class__.__name__,
                          repr(self.y_accessor.metric_accessor),
-                         repr(self.y_accessor.parameter_names))
+                         repr(self.y_accessor.parameter_names),
+                         repr(self.dtype), repr(self.ragged))
+
+    @property
+    def owns_results(self):
+        return not self.ragged and self.y_accessor.owns_results
+
+    def metric_names(self):
+        return self.y_accessor.metric_names()
 
     def access(self, cube):
         yss = self.y_accessor(cube)
         xs = np.arange(yss.shape[1])
         return xs, yss
 
+    def iter_blocks(self, cube, chunk_size):
+        for yss in self.y_accessor.iter_blocks(cube, chunk_size):
+            yield np.arange(yss.shape[1]), yss
+
 
 class XSeriesYSeries(YSeriesXRangeAccessor):
-    def __init__(self, x_name, y_name, *parameter_names):
-        super().__init__(y_name, *parameter_names)
-        self.x_accessor = FirstAccess(x_name, *parameter_names,
-                                      aggregator=None,
-                                      auto_numpyfy=False)
+    def __init__(self, x_name, y_name, *parameter_names, dtype=None,
+                 ragged=False):
+        super().__init__(y_name, *parameter_names, dtype=dtype,
+                         ragged=ragged)
+        # The abscissa is kept in double precision
+        if ragged:
+            # Each row has its own abscissa
+            self.x_accessor = MetricOverParameter(
+                x_name, *parameter_names,
+                aggregator=partial(RaggedSeries.from_rows, dtype=np.float64),
+                auto_numpyfy=False)
+        else:
+            # Shared by the rows
+            self.x_accessor = FirstAccess(x_name, *parameter_names,
+                                          aggregator=None,
+                                          auto_numpyfy=False,
+                                          dtype=np.float64)
 
     def __repr__(self):
-        return "{}(x_name={}, y_name={}, parameter_names=*{})" \
+        return "{}(x_name={}, y_name={}, parameter_names=*{}, dtype={}, " \
+               "ragged={})" \
                "".format(self.__class__.__name__,
                          repr(self.x_accessor.metric_accessor),
                          repr(self.y_accessor.metric_accessor),
-                         repr(self.y_accessor.parameter_names))
+                         repr(self.y_accessor.parameter_names),
+                         repr(self.dtype), repr(self.ragged))
+
+    def metric_names(self):
+        return union_metric_names((self.x_accessor, self.y_accessor))
 
     def access(self, cube):
         yss = self.y_accessor(cube)
         xs = self.x_accessor(cube)
         return xs, yss
 
+    def iter_blocks(self, cube, chunk_size):
+        if self.ragged:
+            blocks = zip(self.x_accessor.iter_blocks(cube, chunk_size),
+                         self.y_accessor.iter_blocks(cube, chunk_size))
+            for xs, yss in blocks:
+                yield xs, yss
+            return
+        xs = self.x_accessor(cube)
+        for yss in self.y_accessor.iter_blocks(cube, chunk_size):
+            yield xs, yss
+
 
 class InterpXYSeries(XSeriesYSeries):
+    """
+    Interpolates the series (see `np.interp`) at `interp_points` (an array
+    [m] or [n, m], or an accessor thereof). The rows are interpolated in one
+    batch; `dtype` (e.g. `np.float32`) sets the dtype of the result (None
+    for the default dtype).
+    """
+    owns_results = True
+
     def __init__(self, interp_points, x_accessor, y_accessor, *parameter_names,
-                 left=None, right=None, period=None):
+                 left=None, right=None, period=None, dtype=None,
+                 ragged=False):
         self.interp_points = interp_points
-        super().__init__(x_accessor, y_accessor, *parameter_names)
+        super().__init__(x_accessor, y_accessor, *parameter_names,
+                         dtype=dtype, ragged=ragged)
         self.left = left
         self.right = right
         self.period = period
 
+    def __repr__(self):
+        return "{}(interp_points={}, x_name={}, y_name={}, " \
+               "parameter_names=*{}, left={}, right={}, period={}, dtype={}, " \
+               "ragged={})" \
+               "".format(self.__class__.__name__,
+                         describe_value(self.interp_points),
+                         repr(self.x_accessor.metric_accessor),
+                         repr(self.y_accessor.metric_accessor),
+                         repr(self.y_accessor.parameter_names),
+                         repr(self.left), repr(self.right),
+                         repr(self.period), repr(self.dtype),
+                         repr(self.ragged))
 
     def access(self, cube):
         yss = self.y_accessor(cube)
         xs = self.x_accessor(cube)
-        if xs.ndim == 2:
-            xss = xs
-        else:
-            xss = [xs for _ in range(len(yss))]
 
-        ps = self.interp_points if not isinstance(self.interp_points, Accessor) \
-            else self.interp_points(cube)
+        ps = self.get_interp_points(cube)
 
-        if ps.ndim == 2:
-            pss = ps
-        else:
-            pss = [ps for _ in range(len(yss))]
+        results = self.interpolate(ps, xs, yss)
 
-        results = []
-        for ps, xs, ys in zip(pss, xss, yss):
-            r = np.interp(ps, xs, ys, left=self.left, right=self.right,
-                          period=self.period)
-            results.append(r)
+        return (ps[0] if ps.ndim == 2 else ps), results
 
-        results = np.array(results)
+    def interpolate(self, ps, xs, yss):
+        interp = interp_ragged if isinstance(yss, RaggedSeries) \
+            else interp_rows
+        return interp(ps, xs, yss, left=self.left, right=self.right,
+                      period=self.period, dtype=self.get_dtype())
 
-        return pss[0], results
+    def metric_names(self):
+        names = super().metric_names()
+        if names is None or not isinstance(self.interp_points, Accessor):
+            return names
+        points_names = self.interp_points.metric_names()
+        return None if points_names is None else names | points_names
 
+    def get_interp_points(self, cube):
+        ps = self.interp_points if not isinstance(self.interp_points, Accessor) \
+            else self.interp_points(cube)
+        return np.asarray(ps)
 
+    def iter_blocks(self, cube, chunk_size):
+        ps = self.get_interp_points(cube)
+        if ps.ndim == 2:
+            # Per-row points are not aligned on the chunks
+            yield self(cube)
+            return
+        for xs, yss in super().iter_blocks(cube, chunk_size):
+            yield ps, self.interpolate(ps, xs, yss)
 
 
 class YSeriesByParamOverParams(SeriesAccessor):
@@ -240,74 +1328,220 @@ class YSeriesByParamOverParams(SeriesAccessor):
     The values are of an atomic metric, ordered by a parameter domain value.
     The number of datapoints (n) are from the other parameters
     """
-    def __init__(self, metric_name, by_param_name, *parameter_names):
+    owns_results = True
+
+    def __init__(self, metric_name, by_param_name, *parameter_names,
+                 dtype=None):
         self.by_param_name = by_param_name
         self.metric_accessor = name_to_accessor(metric_name)
         self.parameter_names = parameter_names
+        self.dtype = dtype
+
+    def metric_names(self):
+        return self.metric_accessor.metric_names()
+
+    def access_vectorized(self, cube):
+        """
+        Fast path of `access`: gather the [n, k] matrix from one numpyfied
+        block rather than calling the metric accessor per sub-cube.
+
+        Return None if the metric accessor or the cube does not allow it.
+        """
+        if not isinstance(self.metric_accessor, (GetByName, NumpyfySqueeze)):
+            return None
+
+        domain = getattr(cube, "domain", None)
+        if domain is None or self.by_param_name not in domain:
+            return None
+
+        names = (self.by_param_name,) + tuple(self.parameter_names)
+        squeeze = isinstance(self.metric_accessor, NumpyfySqueeze)
+        if not squeeze and set(domain.keys()) - set(names):
+            # The sub-cubes would not be reduced to atomic values
+            return None
+
+        block = gather(cube, self.metric_accessor.metric_name, *names,
+                       squeeze=squeeze, dtype=self.get_dtype())
+        if block is None or block.ndim != len(names):
+            return None
+
+        try:
+            xs = np.asarray(domain[self.by_param_name], dtype=float)
+        except (TypeError, ValueError):
+            return None
+
+        k = block.shape[0]
+        n = int(np.prod(block.shape[1:], dtype=int))
+        yss = np.empty((n, k), dtype=block.dtype)
+        yss.reshape(block.shape[1:] + (k,))[...] = np.moveaxis(block, 0, -1)
+        return xs, yss
 
     def access(self, cube):
+        res = self.access_vectorized(cube)
+        if res is not None:
+            return res
+
         values = []
         xs = []
-        for (x,), cube_i in cube.iter_dimensions(self.by_param_name):
-            xs.append(float(x))
-            for _, cube_ii in cube_i.iter_dimensions(*self.parameter_names):
-                values.append(self.metric_accessor(cube_ii))
+        cube = project(cube, self.metric_names())
+        with no_cache():
+            for (x,), cube_i in cube.iter_dimensions(self.by_param_name):
+                xs.append(float(x))
+                for _, cube_ii in \
+                        cube_i.iter_dimensions(*self.parameter_names):
+                    values.append(self.metric_accessor(cube_ii))
 
         xs = np.array(xs)
-        yss = np.array(values, dtype=np.float).T
+        yss = np.array(values, dtype=self.get_dtype())
+        yss = yss.reshape(len(xs), -1).T
         return xs, yss
 
     def __repr__(self):
-        return "{}(metric_name={}, by_param_name={}, parameter_names=*{})" \
+        return "{}(metric_name={}, by_param_name={}, parameter_names=*{}, " \
+               "dtype={})" \
                "".format(self.__class__.__name__,
                          repr(self.metric_accessor),
                          repr(self.by_param_name),
-                         repr(self.y_accessor.parameter_names))
+                         repr(self.parameter_names),
+                         repr(self.dtype))
 
 
 class MedianFilteredSeries(SeriesAccessor):
-    def __init__(self, decorated, window_size=10):
+    """
+    Running median (over `window_size` steps) of the decorated series. NaNs
+    (e.g. failed epochs) are skipped rather than spread over the window.
+    The filter works on blocks of at most `max_elements` windowed values.
+    """
+    owns_results = True
+
+    def __init__(self, decorated, window_size=10, max_elements=2**24):
         self.decorated = decorated
         self.window_size = window_size
+        self.max_elements = max_elements
+
+    def children(self):
+        return self.decorated,
 
     def access(self, cube):
-        from scipy.ndimage import median_filter
-        xs, yss = self.decorated.access(cube)
+        [((xs, yss), _)] = self.evaluate_children(cube)
 
-        yss = median_filter(yss, size=(1, self.window_size))
+        yss = running_median(yss, self.window_size, self.max_elements)
 
         return xs, yss
 
+    def iter_blocks(self, cube, chunk_size):
+        for xs, yss in self.decorated.iter_blocks(cube, chunk_size):
+            yield xs, running_median(yss, self.window_size,
+                                     self.max_elements)
+
+    def __repr__(self):
+        return "{}(decorated={}, window_size={})" \
+               "".format(self.__class__.__name__, repr(self.decorated),
+                         repr(self.window_size))
+
 
 class SamplingSeries(SeriesAccessor):
-    def __init__(self, decorated, sampling_rate=.1):
+    """
+    Downsamples the decorated series.
+
+    By default, one point every `sampling_rate * k` steps is kept. If a
+    point budget `n_points` (e.g. the pixel width of the axes) is given,
+    `method` selects a visually faithful downsampling instead:
+
+    - "lttb": Largest-Triangle-Three-Buckets. The selected points differ
+      from row to row, so the abscissa is [n, n_points] (unless all rows
+      agree): suited to `TrajectoryDisplayer`.
+    - "minmax": the min and max of `n_points // 2` buckets. The abscissa
+      stays shared by the rows: suited to aggregating displayers.
+
+    The budget must be at least 3 points for "lttb" and 2 for "minmax".
+    """
+    def __init__(self, decorated, sampling_rate=.1, n_points=None,
+                 method="lttb"):
+        if method not in ("lttb", "minmax"):
+            raise ValueError("Unknown sampling method '{}'".format(method))
+        minimum = 3 if method == "lttb" else 2
+        if n_points is not None and n_points < minimum:
+            raise ValueError("The '{}' sampling needs a budget of at least "
+                             "{} points (got {})"
+                             "".format(method, minimum, n_points))
         self.decorated = decorated
         self.sampling_rate = sampling_rate
+        self.n_points = n_points
+        self.method = method
 
-    def access(self, cube):
-        from scipy.ndimage import median_filter
-        xs, yss = self.decorated.access(cube)
+    @property
+    def owns_results(self):
+        # The strided sampling returns views (see `sample` for the budget)
+        return self.n_points is not None
 
-        span = int(self.sampling_rate * len(xs))
+    def children(self):
+        return self.decorated,
+
+    def access(self, cube):
+        [(series, _)] = self.evaluate_children(cube)
+        return self.sample(*series)
+
+    def sample(self, xs, yss):
+        if self.n_points is not None:
+            downsample = lttb if self.method == "lttb" else minmax_envelope
+            sampled_xs, sampled_yss = downsample(xs, yss, self.n_points)
+            if np.may_share_memory(sampled_yss, yss):
+                # Series within the budget are passed through: the result
+                # must not be the (possibly shared) decorated one
+                sampled_yss = sampled_yss.copy()
+            return sampled_xs, sampled_yss
+
+        span = max(1, int(self.sampling_rate * len(xs)))
         xs, yss = xs[::span], yss[:, ::span]
         return xs, yss
 
+    def iter_blocks(self, cube, chunk_size):
+        for xs, yss in self.decorated.iter_blocks(cube, chunk_size):
+            yield self.sample(xs, yss)
+
+    def __repr__(self):
+        return "{}(decorated={}, sampling_rate={}, n_points={}, method={})" \
+               "".format(self.__class__.__name__, repr(self.decorated),
+                         repr(self.sampling_rate), repr(self.n_points),
+                         repr(self.method))
+
 
 class DeltaSeries(SeriesAccessor):
-    def __init__(self, first_accessors, second_accessors):
+    """
+    Difference of the series of two accessors, computed in `dtype` (None for
+    the default dtype)
+    """
+    def __init__(self, first_accessors, second_accessors, dtype=None):
         self.first_accessors = first_accessors
         self.second_accessors = second_accessors
+        self.dtype = dtype
+
+    owns_results = True
+
+    def children(self):
+        return self.first_accessors, self.second_accessors
+
+    def subtract(self, yss1, yss2, owned_1=False, owned_2=False):
+        return subtract(yss1, yss2, owned_1, owned_2, dtype=self.get_dtype())
 
     def access(self, cube):
-        xs, yss1 = self.first_accessors(cube)
-        _, yss2 = self.second_accessors(cube)
-        return xs, yss1 - yss2
+        ((xs, yss1), owned_1), ((_, yss2), owned_2) = \
+            self.evaluate_children(cube)
+        return xs, self.subtract(yss1, yss2, owned_1, owned_2)
+
+    def iter_blocks(self, cube, chunk_size):
+        blocks = zip(self.first_accessors.iter_blocks(cube, chunk_size),
+                     self.second_accessors.iter_blocks(cube, chunk_size))
+        for (xs, yss1), (_, yss2) in blocks:
+            yield xs, self.subtract(yss1, yss2)
 
     def __repr__(self):
-        return "{}(first_accessors={}, second_accessors={})" \
+        return "{}(first_accessors={}, second_accessors={}, dtype={})" \
                "".format(self.__class__.__name__,
                          repr(self.first_accessors),
-                         repr(self.second_accessors),)
+                         repr(self.second_accessors),
+                         repr(self.dtype))
 
 
 class AtomicAcessor(MetricOverParameter):
@@ -318,9 +1552,11 @@ class AtomicAcessor(MetricOverParameter):
 
     vs: np.array [k]
     """
-    def __init__(self, metric_name, *parameter_names):
+    def __init__(self, metric_name, *parameter_names, masked=False,
+                 dtype=None, labelled=False):
         super().__init__(metric_name, *parameter_names, aggregator=None,
-                         auto_numpyfy=False)
+                         auto_numpyfy=False, masked=masked, dtype=dtype,
+                         labelled=labelled)
 
 
 
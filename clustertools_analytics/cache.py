@@ -0,0 +1,479 @@
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from .precision import get_default_dtype
+
+_active_cache = None
+
+
+def get_cache():
+    """Return the cache currently used by the accessors (or None)"""
+    return _active_cache
+
+
+def set_cache(cache):
+    """
+    Make `cache` the one used by the accessors (None to disable caching).
+    Return the previous one.
+    """
+    global _active_cache
+    previous = _active_cache
+    _active_cache = cache
+    return previous
+
+
+@contextmanager
+def no_cache():
+    """
+    Suspend the active cache (e.g. while iterating over sub-cubes, whose
+    results are never reused)
+    """
+    previous = set_cache(None)
+    try:
+        yield
+    finally:
+        set_cache(previous)
+
+
+def describe_cube(cube):
+    """
+    Fingerprint of the content of the cube (name, parameter domain, metrics
+    and size).
+    """
+    domain = getattr(cube, "domain", None)
+    if domain is not None:
+        domain = tuple((p, tuple(vs)) for p, vs in domain.items())
+    metrics = getattr(cube, "metrics", None)
+    if metrics is not None:
+        metrics = tuple(metrics)
+    return getattr(cube, "name", None), domain, metrics, len(cube)
+
+
+# Default `object.__repr__` (e.g. "<function <lambda> at 0x7f...>")
+_ADDRESS_REPR = re.compile(r" at 0x[0-9a-fA-F]+>")
+
+
+def describe_accessor(accessor):
+    """
+    Canonical description of the accessor (its `repr`) or None if the
+    accessor does not have one: its `repr`, or the one of any of its
+    sub-accessors or aggregators, is the default `object.__repr__`, whose
+    memory address may be reused by another object.
+    """
+    if type(accessor).__repr__ is object.__repr__:
+        return None
+    description = repr(accessor)
+    if _ADDRESS_REPR.search(description) is not None:
+        return None
+    return description
+
+
+def describe_value(value):
+    """
+    `repr` of `value`, except for arrays which are described by their shape,
+    dtype and a digest of their content (their `repr` is truncated)
+    """
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(value).tobytes())
+        return "array(shape={}, dtype={}, sha1={})" \
+               "".format(value.shape, value.dtype, digest.hexdigest())
+    return repr(value)
+
+
+def freeze(value):
+    """
+    Return a read-only view of the arrays in `value` (or `value.frozen()`)
+    """
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, tuple):
+        return tuple(freeze(v) for v in value)
+    if hasattr(value, "frozen"):
+        return value.frozen()
+    return value
+
+
+def size_of(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(size_of(v) for v in value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+class CellStore(object):
+    """
+    The per-coordinate results of an accessor over the cubes of a given name
+    (see `AccessorCache.cells`): the value of each parameter combination
+    already read, with the fingerprint of its sub-cube at the time
+    """
+    def __init__(self, key):
+        self.key = key
+        self._cells = {}
+        self.nbytes = 0
+
+    def get(self, coordinates, fingerprint):
+        """The value at `coordinates` if its fingerprint is unchanged"""
+        entry = self._cells.get(coordinates)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, coordinates, fingerprint, value):
+        """Record `value` at `coordinates` and return its read-only version"""
+        previous = self._cells.pop(coordinates, None)
+        if previous is not None:
+            self.nbytes -= size_of(previous[1])
+        value = freeze(value)
+        self._cells[coordinates] = fingerprint, value
+        self.nbytes += size_of(value)
+        return value
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __repr__(self):
+        return "{}(key={})".format(self.__class__.__name__, repr(self.key))
+
+
+class AccessorCache(object):
+    """
+    `AccessorCache`
+    ===============
+    In-memory memoization of the accessor results, with LRU eviction once
+    `max_bytes` are held.
+
+    Results are keyed on the cube identity and content fingerprint, together
+    with the accessor `repr` and the default dtype (see
+    `precision.set_default_dtype`). Accessors relying on the default
+    `object.__repr__`, even through a sub-accessor or an aggregator (e.g. a
+    lambda), are not cached.
+    The cached arrays are read-only.
+
+    If `incremental`, the accessors iterating over the parameter
+    combinations (see `accessor.MetricOverParameter`) also record their
+    value per combination, keyed on the cube name rather than its identity
+    (see `cells`). A new cube of the same name (e.g. reloaded while the
+    sweep is running) then only reads the combinations which are new or
+    whose sub-cube has changed (parameter domain, number of results, or
+    `cell_version(sub_cube)` if given, e.g. the mtime of the result).
+
+    Example
+    -------
+    >>> with AccessorCache(max_bytes=2**30) as cache:
+    ...     plot.plot(cube)
+    >>> cache.hits, cache.misses, cache.evictions
+
+    >>> cache = AccessorCache(incremental=True)
+    >>> while sweep_is_running():
+    ...     with cache:
+    ...         plot.plot(load_cube())  # Reads the new results only
+    """
+    def __init__(self, max_bytes=2**30, incremental=False, cell_version=None):
+        self.max_bytes = max_bytes
+        self.incremental = incremental
+        self.cell_version = cell_version
+        self._entries = OrderedDict()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cell_hits = 0
+        self.cell_misses = 0
+        self._previous = None
+
+    def key(self, accessor, cube):
+        description = describe_accessor(accessor)
+        if description is None:
+            return None
+        # Accessors without a dtype override follow the default dtype
+        return id(cube), describe_cube(cube), description, \
+            get_default_dtype().str
+
+    def lookup(self, key):
+        try:
+            _, value, _ = self._entries[key]
+        except KeyError:
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key):
+        """Return whether `key` is cached and the corresponding value"""
+        hit, value = self.lookup(key)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit, value
+
+    def put(self, key, value, cube, nested=False):
+        """
+        Cache `value` under `key` and return its read-only version. A
+        reference to `cube` is kept as long as the entry lives so that its
+        identity cannot be reused. `nested` tells whether `value` is an
+        intermediate result, computed for another accessor.
+        """
+        value = freeze(value)
+        n_bytes = size_of(value)
+        if n_bytes > self.max_bytes:
+            return value
+
+        if key in self._entries:
+            self.n_bytes -= self._entries.pop(key)[2]
+
+        while self._entries and self.n_bytes + n_bytes > self.max_bytes:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.n_bytes -= size
+            self.evictions += 1
+
+        self._entries[key] = cube, value, n_bytes
+        self.n_bytes += n_bytes
+        return value
+
+    def cells(self, accessor, cube):
+        """
+        Return the `CellStore` of the per-combination values of `accessor`
+        over the cubes named as `cube` (None if not `incremental`). Once
+        updated, it must be given back to `put_cells`.
+        """
+        if not self.incremental:
+            return None
+        description = describe_accessor(accessor)
+        if description is None:
+            return None
+        key = "cells", getattr(cube, "name", None), description, \
+            get_default_dtype().str
+        hit, store = AccessorCache.lookup(self, key)
+        return store if hit else CellStore(key)
+
+    def put_cells(self, store):
+        """(Re)account for the `CellStore` `store` (see `cells`)"""
+        AccessorCache.put(self, store.key, store, None)
+
+    def fingerprint(self, cube):
+        """The fingerprint of a sub-cube in a `CellStore`"""
+        version = None if self.cell_version is None else \
+            self.cell_version(cube)
+        return describe_cube(cube)[1:], version
+
+    def clear(self):
+        self._entries.clear()
+        self.n_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        self._previous = set_cache(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        set_cache(self._previous)
+        self._previous = None
+
+    def __repr__(self):
+        return "{}(max_bytes={}, incremental={}, cell_version={})" \
+               "".format(self.__class__.__name__, self.max_bytes,
+                         repr(self.incremental), repr(self.cell_version))
+
+    def __str__(self):
+        description = "{}: {} entries ({} bytes), {} hits, {} misses, " \
+                      "{} evictions" \
+                      "".format(self.__class__.__name__, len(self),
+                                self.n_bytes, self.hits, self.misses,
+                                self.evictions)
+        if self.incremental:
+            description += ", {} cells reused, {} cells read" \
+                           "".format(self.cell_hits, self.cell_misses)
+        return description
+
+
+class DiskCache(AccessorCache):
+    """
+    `DiskCache`
+    ===========
+    An `AccessorCache` which also persists the array results (arrays and
+    tuples of arrays, such as the `SeriesAccessor` (xs, yss) pairs, but not
+    masked arrays) in
+    `directory` as `.npy` files. Those are loaded as read-only memory maps,
+    so that a new session only pays for what it actually reads.
+
+    The sidecar index (`index.json`) is keyed on the accessor description
+    and the cube fingerprint (the identity of the cube is not part of it).
+    Each entry records the modification times of the cube sources, as
+    returned by `source_mtime(cube)` (e.g. the mtime of the experiment
+    storage folder). An entry whose mtimes differ is invalidated.
+    If `source_mtime` is None, only the cube fingerprint (which includes
+    the number of results) is used.
+
+    Only the results handed to the callers are persisted: the intermediate
+    ones (of the sub-accessors) and the per-combination values of an
+    `incremental` cache are only kept in memory, as are the masked results.
+    The index is written by `flush`, on exit of the `with` block.
+
+    The in-memory layer holds at most `max_bytes` of results (`.npy` files
+    are memory-mapped, so this bounds mostly the freshly computed ones).
+    """
+    INDEX = "index.json"
+
+    def __init__(self, directory, source_mtime=None, max_bytes=2**30,
+                 incremental=False, cell_version=None):
+        super().__init__(max_bytes=max_bytes, incremental=incremental,
+                         cell_version=cell_version)
+        self.directory = os.path.realpath(os.path.expanduser(directory))
+        self.source_mtime = source_mtime
+        self.disk_hits = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = self._load_index()
+        self._dirty = False
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, self.INDEX)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as hdl:
+                return json.load(hdl)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """Write the index, if it has changed"""
+        if not self._dirty:
+            return
+        tmp_path = "{}.{}.tmp".format(self.index_path, os.getpid())
+        with open(tmp_path, "w") as hdl:
+            json.dump(self._index, hdl, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def _mtimes(self, cube):
+        if self.source_mtime is None:
+            return None
+        mtimes = self.source_mtime(cube)
+        if np.isscalar(mtimes):
+            return float(mtimes),
+        return tuple(float(m) for m in mtimes)
+
+    def key(self, accessor, cube):
+        key = super().key(accessor, cube)
+        if key is None:
+            return None
+        _, fingerprint, description, dtype = key
+        digest = hashlib.sha1(repr((fingerprint, description,
+                                    dtype)).encode())
+        return key + (digest.hexdigest(), self._mtimes(cube))
+
+    def _remove(self, digest):
+        entry = self._index.pop(digest, None)
+        if entry is None:
+            return
+        self._dirty = True
+        for fname in entry["files"]:
+            try:
+                os.remove(os.path.join(self.directory, fname))
+            except OSError:
+                pass
+
+    def _load(self, digest, mtimes):
+        entry = self._index.get(digest)
+        if entry is None:
+            return None
+        if entry["mtimes"] != (None if mtimes is None else list(mtimes)):
+            # Sources have changed
+            self._remove(digest)
+            return None
+        try:
+            arrays = [np.load(os.path.join(self.directory, fname),
+                              mmap_mode="r", allow_pickle=False)
+                      for fname in entry["files"]]
+        except (OSError, ValueError):
+            self._remove(digest)
+            return None
+        return tuple(arrays) if entry["is_tuple"] else arrays[0]
+
+    def lookup(self, key):
+        hit, value = super().lookup(key)
+        if hit:
+            return hit, value
+
+        value = self._load(*key[-2:])
+        if value is None:
+            return False, None
+        self.disk_hits += 1
+        super().put(key, value, None)
+        return True, value
+
+    def put(self, key, value, cube, nested=False):
+        value = super().put(key, value, cube)
+        if nested:
+            return value
+
+        is_tuple = isinstance(value, tuple)
+        arrays = value if is_tuple else (value,)
+        # The masks of masked arrays cannot be saved as .npy
+        if not all(isinstance(a, np.ndarray) and a.dtype != object and
+                   not np.ma.isMaskedArray(a) for a in arrays):
+            return value
+
+        digest, mtimes = key[-2:]
+        self._remove(digest)
+        files = []
+        for i, array in enumerate(arrays):
+            fname = "{}_{}.npy".format(digest, i)
+            tmp_path = os.path.join(self.directory,
+                                    "{}.{}.tmp".format(fname, os.getpid()))
+            try:
+                with open(tmp_path, "wb") as hdl:
+                    np.save(hdl, array, allow_pickle=False)
+                os.replace(tmp_path, os.path.join(self.directory, fname))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            files.append(fname)
+
+        self._index[digest] = {"accessor": key[2],
+                               "cube": key[1][0],
+                               "mtimes": None if mtimes is None else
+                               list(mtimes),
+                               "is_tuple": is_tuple,
+                               "files": files}
+        self._dirty = True
+        return value
+
+    def clear(self, disk=False):
+        """Clear the in-memory layer (and the files if `disk`)"""
+        super().clear()
+        if disk:
+            for digest in list(self._index.keys()):
+                self._remove(digest)
+            self.flush()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        self.flush()
+
+    def __repr__(self):
+        return "{}(directory={}, source_mtime={}, max_bytes={}, " \
+               "incremental={}, cell_version={})" \
+               "".format(self.__class__.__name__, repr(self.directory),
+                         repr(self.source_mtime), self.max_bytes,
+                         repr(self.incremental), repr(self.cell_version))
+
+    def __str__(self):
+        return "{} ({} disk hits, {} entries on disk)" \
+               "".format(super().__str__(), self.disk_hits, len(self._index))
@@ -0,0 +1,812 @@
+"""
+Vectorized numerical kernels working on whole [n, k] blocks of series
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .precision import resolve_dtype
+
+
+def _count_le(xss, pss):
+    """
+    For each row i and each point pss[i, j], the number of xss[i] values
+    lower or equal to it (i.e. `np.searchsorted(xss[i], pss[i], 'right')`).
+    Rows of `xss` must be sorted.
+    """
+    n, k = xss.shape
+    m = pss.shape[1]
+    # Stable merge: on ties, the xs (first) come before the ps
+    merged = np.concatenate([xss, pss], axis=1)
+    order = np.argsort(merged, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(k + m)[np.newaxis, :], axis=1)
+    p_ranks = ranks[:, k:]
+    # Number of ps before each p in the merge
+    p_order = np.argsort(pss, axis=1, kind="stable")
+    p_before = np.empty_like(p_order)
+    np.put_along_axis(p_before, p_order, np.arange(m)[np.newaxis, :], axis=1)
+    return p_ranks - p_before
+
+
+def interp_rows(ps, xs, yss, left=None, right=None, period=None,
+                dtype=None):
+    """
+    Row-wise `np.interp` over a whole block.
+
+    Parameters
+    ----------
+    ps: array [m] or [n, m]
+        The points where to interpolate (shared or per row)
+    xs: array [k] or [n, k]
+        The increasing abscissa of the data points (shared or per row)
+    yss: array [n, k]
+        The n series to interpolate
+    left, right, period:
+        As in `np.interp`
+    dtype: numpy dtype or None (default: None)
+        The dtype of the values and the result (e.g. `np.float32` to halve
+        the memory). If None, float64. The abscissa and the points are kept
+        in (at least) double precision.
+
+    Return
+    ------
+    rss: array [n, m]
+        rss[i] = np.interp(ps[i], xs[i], yss[i], left, right, period)
+    """
+    dtype = np.dtype(np.float64 if dtype is None else dtype)
+    yss = np.asarray(yss, dtype=dtype)
+    if yss.ndim == 1:
+        yss = yss[np.newaxis, :]
+    n, k = yss.shape
+    coord_dtype = np.result_type(dtype, np.float64)
+    xs = np.asarray(xs, dtype=coord_dtype)
+    ps = np.asarray(ps, dtype=coord_dtype)
+
+    if k == 0:
+        raise ValueError("Cannot interpolate over empty series")
+
+    if period is not None:
+        if period == 0:
+            raise ValueError("period must be a non-zero value")
+        period = abs(period)
+        left = right = None
+        ps = ps % period
+        xs = xs % period
+        order = np.argsort(xs, axis=-1, kind="stable")
+        if xs.ndim == 1:
+            xs = xs[order]
+            yss = yss[:, order]
+        else:
+            xs = np.take_along_axis(xs, order, axis=1)
+            yss = np.take_along_axis(yss, order, axis=1)
+        xs = np.concatenate([xs[..., -1:] - period, xs, xs[..., :1] + period],
+                            axis=-1)
+        yss = np.concatenate([yss[:, -1:], yss, yss[:, :1]], axis=1)
+        k += 2
+
+    shared_xs = xs.ndim == 1
+    pss = np.broadcast_to(ps, (n, ps.shape[-1]))
+    xss = xs[np.newaxis, :] if shared_xs else xs
+
+    if k == 1:
+        rss = np.repeat(yss, pss.shape[1], axis=1)
+    elif shared_xs and ps.ndim == 1:
+        # Same weights for all the rows: plain column gathers
+        j = np.clip(np.searchsorted(xs, ps, side="right") - 1, 0, k - 2)
+        x0, x1 = xs[j], xs[j + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ws = ((ps - x0) / (x1 - x0)).astype(dtype, copy=False)
+        y0 = yss[:, j]
+        rss = yss[:, j + 1] - y0
+        rss *= ws
+        rss += y0
+        on_x0 = ps == x0
+        rss[:, on_x0] = y0[:, on_x0]
+    else:
+        if shared_xs:
+            counts = np.searchsorted(xs, ps, side="right")
+            counts = np.broadcast_to(counts, pss.shape)
+        else:
+            counts = _count_le(xss, pss)
+        j = np.clip(counts - 1, 0, k - 2)
+
+        x0 = np.take_along_axis(np.broadcast_to(xss, (n, k)), j, axis=1)
+        x1 = np.take_along_axis(np.broadcast_to(xss, (n, k)), j + 1, axis=1)
+        y0 = np.take_along_axis(yss, j, axis=1)
+        y1 = np.take_along_axis(yss, j + 1, axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rss = ((pss - x0) / (x1 - x0)).astype(dtype, copy=False)
+        rss *= (y1 - y0)
+        rss += y0
+        # Exact match with a data point (np.interp does not interpolate)
+        on_x0 = pss == x0
+        rss[on_x0] = y0[on_x0]
+
+    first = xss[:, :1]
+    last = xss[:, -1:]
+    on_last = pss == last
+    if on_last.any():
+        rss[on_last] = np.broadcast_to(yss[:, -1:], rss.shape)[on_last]
+
+    below = pss < first
+    if below.any():
+        fill = yss[:, :1] if left is None else np.asarray(left, dtype=dtype)
+        rss[below] = np.broadcast_to(fill, rss.shape)[below]
+    above = pss > last
+    if above.any():
+        fill = yss[:, -1:] if right is None else np.asarray(right, dtype=dtype)
+        rss[above] = np.broadcast_to(fill, rss.shape)[above]
+
+    return rss
+
+
+def _reflect_columns(yss, start, stop):
+    """
+    Columns `start` to `stop` (excluded) of `yss`, where out-of-range
+    indices are reflected about the edges ('reflect' mode of scipy.ndimage,
+    'symmetric' mode of np.pad)
+    """
+    k = yss.shape[1]
+    idx = np.arange(start, stop) % (2 * k)
+    idx = np.where(idx >= k, 2 * k - idx - 1, idx)
+    return yss[:, idx]
+
+
+def _nan_median_windows(windows):
+    """
+    Median of the non-NaN values of each window (last axis). For an even
+    number of values, the higher of the two middle ones is taken (as
+    `scipy.ndimage.median_filter`). All-NaN windows yield NaN.
+    """
+    values = np.array(windows, dtype=np.result_type(windows.dtype, np.float16))
+    w = values.shape[-1]
+    mid = w // 2
+    nans = np.isnan(values)
+    counts = w - nans.sum(axis=-1)
+    if counts.min() < w:
+        # Turn the NaNs into -inf/+inf so that the middle of the window is
+        # the middle of its non-NaN values
+        n_low = (mid - counts // 2)[..., np.newaxis]
+        nan_ranks = np.cumsum(nans, axis=-1)
+        values[nans & (nan_ranks <= n_low)] = -np.inf
+        values[nans & (nan_ranks > n_low)] = np.inf
+
+    medians = np.partition(values, mid, axis=-1)[..., mid]
+    medians[counts == 0] = np.nan
+    return medians
+
+
+def running_median(yss, window_size, max_elements=2**24):
+    """
+    NaN-aware running median of each row of `yss`, computed over blocks of
+    at most `max_elements` windowed values.
+
+    The window of size `window_size` is centered (as in
+    `scipy.ndimage.median_filter(yss, size=(1, window_size))`, with the same
+    'reflect' boundary mode). NaNs are skipped rather than spread: only
+    windows without any value yield NaN.
+
+    Return
+    ------
+    mss: array [n, k]
+        The filtered series
+    """
+    yss = np.asarray(yss)
+    if yss.ndim == 1:
+        yss = yss[np.newaxis, :]
+    dtype = np.result_type(yss.dtype, np.float16)
+    n, k = yss.shape
+    w = int(window_size)
+    if w <= 1 or k == 0:
+        return yss.astype(dtype)
+
+    before = w // 2
+    after = w - 1 - before
+    n_rows = max(1, min(n, max_elements // w))
+    n_cols = max(1, min(k, max_elements // (w * n_rows)))
+
+    mss = np.empty((n, k), dtype=dtype)
+    for r in range(0, n, n_rows):
+        rows = yss[r:r + n_rows]
+        for c in range(0, k, n_cols):
+            stop = min(k, c + n_cols)
+            segment = _reflect_columns(rows, c - before, stop + after)
+            windows = as_strided(segment,
+                                 shape=(len(rows), stop - c, w),
+                                 strides=(segment.strides[0],
+                                          segment.strides[1],
+                                          segment.strides[1]),
+                                 writeable=False)
+            mss[r:r + n_rows, c:stop] = _nan_median_windows(windows)
+    return mss
+
+
+def _bucket_edges(start, stop, n_buckets):
+    return np.floor(np.linspace(start, stop, n_buckets + 1)).astype(int)
+
+
+def lttb(xs, yss, n_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling of each row of `yss` to
+    `n_points` points (first and last points included).
+
+    Parameters
+    ----------
+    xs: array [k]
+        The abscissa
+    yss: array [n, k]
+        The series
+    n_points: int
+        The point budget (e.g. the pixel width of the axes), at least 3.
+        Series of at most `n_points` points are returned as they are.
+
+    Return
+    ------
+    xs: array [n_points] or [n, n_points]
+        The abscissa of the selected points. It is shared (1D) only if the
+        same points are selected for all the rows.
+    yss: array [n, n_points]
+        The selected points
+    """
+    if n_points < 3:
+        raise ValueError("LTTB needs a budget of at least 3 points (got {})"
+                         "".format(n_points))
+    xs = np.asarray(xs)
+    yss = np.asarray(yss)
+    n, k = yss.shape
+    if n_points >= k:
+        return xs, yss
+
+    n_buckets = n_points - 2
+    edges = _bucket_edges(1, k - 1, n_buckets)
+
+    # Average point of each bucket (NaN-aware)
+    inner = yss[:, :k - 1]
+    valid = ~np.isnan(inner)
+    sums = np.add.reduceat(np.where(valid, inner, 0), edges[:-1], axis=1)
+    counts = np.add.reduceat(valid, edges[:-1], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_ys = sums / counts
+    avg_xs = np.add.reduceat(xs[:k - 1], edges[:-1]) / np.diff(edges)
+
+    selected = np.empty((n, n_points), dtype=int)
+    selected[:, 0] = 0
+    selected[:, -1] = k - 1
+    rows = np.arange(n)
+    a_x = np.broadcast_to(xs[0], n)
+    a_y = yss[:, 0]
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < n_buckets:
+            c_x, c_y = avg_xs[b + 1], avg_ys[:, b + 1]
+        else:
+            c_x, c_y = xs[-1], yss[:, -1]
+        bx = xs[lo:hi][np.newaxis, :]
+        by = yss[:, lo:hi]
+        areas = np.abs((a_x - c_x)[:, np.newaxis] * (by - a_y[:, np.newaxis])
+                       - (a_x[:, np.newaxis] - bx)
+                       * (c_y - a_y)[:, np.newaxis])
+        areas[np.isnan(areas)] = -1
+        chosen = lo + np.argmax(areas, axis=1)
+        selected[:, b + 1] = chosen
+        a_x = xs[chosen]
+        a_y = yss[rows, chosen]
+
+    ys_out = np.take_along_axis(yss, selected, axis=1)
+    if (selected == selected[:1]).all():
+        return xs[selected[0]], ys_out
+    return xs[selected], ys_out
+
+
+def minmax_envelope(xs, yss, n_points):
+    """
+    Min/max envelope downsampling of each row of `yss`: the k points are
+    split into `n_points // 2` buckets, each of which is replaced by its
+    minimum and maximum (NaNs skipped), in the order they occur.
+
+    The abscissa stays shared by the rows: the two points of a bucket are
+    placed at its first and last abscissa. The budget must be at least 2
+    points; series which fit in it are returned as they are.
+
+    Return
+    ------
+    xs: array [2 * n_buckets]
+    yss: array [n, 2 * n_buckets]
+    """
+    if n_points < 2:
+        raise ValueError("The min/max envelope needs a budget of at least 2 "
+                         "points (got {})".format(n_points))
+    xs = np.asarray(xs)
+    yss = np.asarray(yss)
+    n, k = yss.shape
+    n_buckets = n_points // 2
+    if 2 * n_buckets >= k:
+        return xs, yss
+
+    edges = _bucket_edges(0, k, n_buckets)
+    lengths = np.diff(edges)
+    offsets = np.arange(lengths.max())
+    idx = edges[:-1, np.newaxis] + offsets[np.newaxis, :]
+    padding = offsets[np.newaxis, :] >= lengths[:, np.newaxis]
+    idx[padding] = edges[:-1, np.newaxis].repeat(len(offsets), 1)[padding]
+
+    buckets = yss[:, idx]  # [n, n_buckets, max length]
+    nans = np.isnan(buckets)
+    lows = np.argmin(np.where(nans, np.inf, buckets), axis=2)
+    highs = np.argmax(np.where(nans, -np.inf, buckets), axis=2)
+    first = np.minimum(lows, highs)
+    second = np.maximum(lows, highs)
+
+    out = np.empty((n, n_buckets, 2), dtype=yss.dtype)
+    out[..., 0] = np.take_along_axis(buckets, first[..., np.newaxis],
+                                     axis=2)[..., 0]
+    out[..., 1] = np.take_along_axis(buckets, second[..., np.newaxis],
+                                     axis=2)[..., 0]
+
+    xs_out = np.empty((n_buckets, 2), dtype=xs.dtype)
+    xs_out[:, 0] = xs[edges[:-1]]
+    xs_out[:, 1] = xs[edges[1:] - 1]
+    return xs_out.reshape(-1), out.reshape(n, -1)
+
+
+def _pad_stats(k, count, mean, m2, mins, maxs):
+    """Extend column statistics to k columns (without values)"""
+    pad = k - len(count)
+    return (np.pad(count, (0, pad)),
+            np.pad(mean, (0, pad)),
+            np.pad(m2, (0, pad)),
+            np.pad(mins, (0, pad), constant_values=np.nan),
+            np.pad(maxs, (0, pad), constant_values=np.nan))
+
+
+class RaggedSeries(object):
+    """
+    `RaggedSeries`
+    ==============
+    n series of different lengths (e.g. early-stopped runs), stored as a
+    flat `values` buffer and the `offsets` [n+1] of the rows: the ith row is
+    `values[offsets[i]:offsets[i+1]]`. The jth column gathers the jth
+    values of the rows long enough, so that the `shape` is (n, the longest
+    length).
+
+    The (NaN-aware) column statistics are computed on the flat buffer (see
+    `moments`), without padding.
+    """
+    ndim = 2
+
+    @classmethod
+    def from_rows(cls, rows, dtype=None):
+        """
+        The `RaggedSeries` of the given rows, in `dtype` (None for the
+        default dtype, see `precision.set_default_dtype`)
+        """
+        dtype = resolve_dtype(dtype)
+        rows = [np.asarray(row, dtype=dtype).ravel() for row in rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.intp)
+        np.cumsum([len(row) for row in rows], out=offsets[1:])
+        values = np.concatenate(rows) if len(rows) > 0 else \
+            np.empty(0, dtype=dtype)
+        return cls(values, offsets)
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def shape(self):
+        lengths = self.lengths
+        return len(lengths), int(lengths.max()) if len(lengths) > 0 else 0
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.offsets.nbytes
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, i):
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def rows(self, start, stop):
+        """The `RaggedSeries` of the rows `start:stop` (a view)"""
+        stop = min(stop, len(self))
+        offsets = self.offsets[min(start, stop):stop + 1]
+        return self.__class__(self.values[offsets[0]:offsets[-1]],
+                              offsets - offsets[0])
+
+    def longest(self):
+        """The longest row"""
+        return self.row(int(np.argmax(self.lengths)))
+
+    def column_indices(self):
+        """The column of each value of the flat buffer"""
+        return np.arange(len(self.values)) - \
+            np.repeat(self.offsets[:-1], self.lengths)
+
+    def padded(self, fill=np.nan):
+        """The [n, k] array of the rows, padded with `fill`"""
+        out = np.full(self.shape, fill,
+                      dtype=np.result_type(self.values.dtype, type(fill)))
+        rows = np.repeat(np.arange(len(self)), self.lengths)
+        out[rows, self.column_indices()] = self.values
+        return out
+
+    def moments(self):
+        """The column `Moments` (NaNs are skipped)"""
+        k = self.shape[1]
+        valid = ~np.isnan(self.values)
+        columns = self.column_indices()[valid]
+        values = self.values[valid].astype(np.float64)
+        count = np.bincount(columns, minlength=k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.bincount(columns, values, minlength=k) / count
+        m2 = np.bincount(columns, (values - mean[columns]) ** 2,
+                         minlength=k)
+        mins = np.full(k, np.nan)
+        np.fmin.at(mins, columns, values)
+        maxs = np.full(k, np.nan)
+        np.fmax.at(maxs, columns, values)
+        return Moments.from_stats(count, mean, m2, mins, maxs)
+
+    def frozen(self):
+        """A read-only view"""
+        values = self.values.view()
+        values.flags.writeable = False
+        return self.__class__(values, self.offsets)
+
+    def __repr__(self):
+        lengths = self.lengths if len(self) > 0 else np.zeros(1, dtype=int)
+        return "{}(n={}, lengths={}..{}, dtype={})" \
+               "".format(self.__class__.__name__, len(self), lengths.min(),
+                         lengths.max(), self.dtype)
+
+
+def column_xs(xs, yss):
+    """
+    The abscissa of the columns of the `RaggedSeries` `yss` (the longest
+    row of a ragged abscissa)
+    """
+    if isinstance(xs, RaggedSeries):
+        return xs.longest()
+    return np.asarray(xs)[:yss.shape[1]]
+
+
+def longest_xs(previous, xs, yss):
+    """
+    The abscissa of the columns of a stream of blocks, updated with the
+    (xs, yss) block (the blocks of a `RaggedSeries` may be shorter)
+    """
+    if not isinstance(yss, RaggedSeries):
+        return xs
+    xs = column_xs(xs, yss)
+    if previous is None or len(xs) > len(previous):
+        return xs
+    return previous
+
+
+def interp_ragged(ps, xs, yss, left=None, right=None, period=None,
+                  dtype=None):
+    """
+    Row-wise `np.interp` of the `RaggedSeries` `yss`, whose abscissa `xs` is
+    either a `RaggedSeries` alike or shared (the ith row then uses the
+    first values of `xs`).
+
+    Return
+    ------
+    rss: array [n, m]
+        The rows interpolated at `ps` (an array [m] or [n, m])
+    """
+    dtype = np.dtype(np.float64 if dtype is None else dtype)
+    ps = np.asarray(ps, dtype=np.float64)
+    n = len(yss)
+    pss = np.broadcast_to(ps, (n, ps.shape[-1]))
+    rss = np.empty(pss.shape, dtype=dtype)
+    for i, ys in enumerate(yss):
+        if len(ys) == 0:
+            rss[i] = np.nan
+            continue
+        xs_i = xs.row(i) if isinstance(xs, RaggedSeries) else \
+            np.asarray(xs)[:len(ys)]
+        rss[i] = np.interp(pss[i], xs_i, ys, left=left, right=right,
+                           period=period)
+    return rss
+
+
+class Moments(object):
+    """
+    `Moments`
+    =========
+    Running NaN-aware column statistics (count, mean, std, min, max) of
+    blocks of rows. The blocks are combined with the parallel variant of
+    Welford's algorithm (Chan et al.), so that two `Moments` can also be
+    merged.
+
+    Example
+    -------
+    >>> moments = Moments()
+    >>> for yss in blocks:
+    ...     moments.update(yss)
+    >>> moments.mean, moments.std
+    """
+    @classmethod
+    def of(cls, yss):
+        return cls().update(yss)
+
+    def __init__(self):
+        self.count = None
+        self._mean = None
+        self._m2 = None
+        self.min = None
+        self.max = None
+        self._frozen = False
+
+    @classmethod
+    def from_stats(cls, count, mean, m2, mins, maxs):
+        """
+        The moments of the given column statistics (m2 being the sum of the
+        squared deviations from the mean)
+        """
+        return cls()._merge(count, mean, m2, mins, maxs)
+
+    def update(self, yss):
+        """
+        Add the rows of `yss` (array [n, k] or `RaggedSeries`). Return self
+        """
+        if isinstance(yss, RaggedSeries):
+            return self.merge(yss.moments())
+        yss = np.asarray(yss, dtype=np.float64)
+        if yss.ndim == 1:
+            yss = yss[np.newaxis, :]
+        valid = ~np.isnan(yss)
+        count = valid.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(valid, yss, 0).sum(axis=0) / count
+            m2 = np.where(valid, (yss - mean) ** 2, 0).sum(axis=0)
+        mins = np.fmin.reduce(yss, axis=0)
+        maxs = np.fmax.reduce(yss, axis=0)
+        return self._merge(count, mean, m2, mins, maxs)
+
+    def merge(self, other):
+        """Add the statistics of `other` (a `Moments`). Return self"""
+        if other.count is None:
+            return self
+        return self._merge(other.count, other._mean, other._m2, other.min,
+                           other.max)
+
+    def _merge(self, count, mean, m2, mins, maxs):
+        if self._frozen:
+            raise ValueError("Frozen moments cannot be updated (copy them "
+                             "first)")
+        if self.count is None:
+            self.count, self._mean, self._m2 = count, mean, m2
+            self.min, self.max = mins, maxs
+            return self
+
+        # Ragged series: the missing columns have no values
+        k = max(len(self.count), len(count))
+        if len(self.count) < k:
+            self.count, self._mean, self._m2, self.min, self.max = \
+                _pad_stats(k, self.count, self._mean, self._m2, self.min,
+                           self.max)
+        if len(count) < k:
+            count, mean, m2, mins, maxs = _pad_stats(k, count, mean, m2,
+                                                     mins, maxs)
+
+        total = self.count + count
+        mine = self.count > 0
+        theirs = count > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = mean - self._mean
+            ratio = count / total
+            both_mean = self._mean + delta * ratio
+            both_m2 = self._m2 + m2 + delta ** 2 * self.count * ratio
+        self._mean = np.where(theirs, np.where(mine, both_mean, mean),
+                              self._mean)
+        self._m2 = np.where(theirs, np.where(mine, both_m2, m2), self._m2)
+        self.min = np.fmin(self.min, mins)
+        self.max = np.fmax(self.max, maxs)
+        self.count = total
+        return self
+
+    def copy(self):
+        """A copy which can be updated without altering self"""
+        other = self.__class__()
+        other.count, other._mean, other._m2 = self.count, self._mean, \
+            self._m2
+        other.min, other.max = self.min, self.max
+        return other
+
+    def frozen(self):
+        """A copy which cannot be updated, with read-only arrays"""
+        other = self.copy()
+        for name in ("count", "_mean", "_m2", "min", "max"):
+            array = getattr(other, name)
+            if array is not None:
+                array = array.view()
+                array.flags.writeable = False
+                setattr(other, name, array)
+        other._frozen = True
+        return other
+
+    @property
+    def nbytes(self):
+        if self.count is None:
+            return 0
+        return sum(a.nbytes for a in (self.count, self._mean, self._m2,
+                                      self.min, self.max))
+
+    @property
+    def mean(self):
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def var(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 0, self._m2 / self.count, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def __len__(self):
+        return 0 if self.count is None else len(self.count)
+
+
+class ColumnStats(object):
+    """
+    `ColumnStats`
+    =============
+    NaN-aware statistics of the k columns of series (see `column_stats`):
+    `count`, `mean`, `std`, `min`, `max` [k] and the `quantiles` [q, k] at
+    the given `levels` (e.g. 0.25, 0.5, 0.75).
+    """
+    @classmethod
+    def from_moments(cls, moments):
+        """The statistics of a `Moments` (without quantiles)"""
+        return cls(moments.count, moments.mean, moments.std, moments.min,
+                   moments.max)
+
+    def __init__(self, count, mean, std, mins, maxs, levels=(),
+                 quantiles=None):
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.min = mins
+        self.max = maxs
+        self.levels = tuple(float(level) for level in levels)
+        if quantiles is None:
+            quantiles = np.empty((0, len(count)))
+        self.quantiles = quantiles
+
+    def quantile(self, level):
+        """The quantile [k] at `level` (one of the `levels`)"""
+        try:
+            return self.quantiles[self.levels.index(float(level))]
+        except ValueError:
+            raise ValueError("Quantile {} not computed (levels: {})"
+                             "".format(level, self.levels)) from None
+
+    @property
+    def median(self):
+        return self.quantile(.5)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.count, self.mean, self.std,
+                                      self.min, self.max, self.quantiles))
+
+    def __len__(self):
+        return len(self.count)
+
+    def __repr__(self):
+        return "{}(k={}, levels={})".format(self.__class__.__name__,
+                                            len(self), repr(self.levels))
+
+
+def _ragged_column_stats(yss, levels):
+    """
+    `column_stats` of the `RaggedSeries` `yss` with quantile `levels`, read
+    from its flat buffer sorted by column (without padding)
+    """
+    moments = yss.moments()
+    k = len(moments)
+    columns = yss.column_indices()
+    values = yss.values.astype(np.float64)
+    # By column, then by value (the NaNs last)
+    values = values[np.lexsort((values, columns))]
+    starts = np.zeros(k, dtype=np.intp)
+    np.cumsum(np.bincount(columns, minlength=k)[:-1], out=starts[1:])
+    last = np.maximum(moments.count - 1, 0)
+
+    quantiles = np.full((len(levels), k), np.nan)
+    for i, level in enumerate(levels):
+        position = last * level
+        below = np.floor(position).astype(np.intp)
+        above = np.minimum(below + 1, last)
+        low = values[starts + below]
+        high = values[starts + above]
+        quantiles[i] = low + (high - low) * (position - below)
+    return ColumnStats(moments.count, moments.mean, moments.std, moments.min,
+                       moments.max, levels, quantiles)
+
+
+def column_stats(yss, levels=(), chunk_size=1024):
+    """
+    NaN-aware statistics of the columns of `yss` (array [n, k] or [n], or
+    `RaggedSeries`) in one pass per block of `chunk_size` columns.
+
+    Without quantile `levels`, the pass is linear. Otherwise, each block is
+    sorted once and all the statistics are read from the sorted block. The
+    quantiles are interpolated linearly (as `np.nanquantile`); the std is
+    the population one (as `np.nanstd`).
+
+    A `RaggedSeries` is never padded: its flat buffer is sorted by column
+    once (and in one block) if quantiles are needed.
+
+    Return
+    ------
+    stats: `ColumnStats`
+        The statistics of the k columns (1 for 1D `yss`)
+    """
+    levels = tuple(float(level) for level in levels)
+    if any(not 0 <= level <= 1 for level in levels):
+        raise ValueError("Quantile levels must be in [0, 1] (got {})"
+                         "".format(levels))
+    if isinstance(yss, RaggedSeries):
+        if len(levels) == 0:
+            return ColumnStats.from_moments(yss.moments())
+        return _ragged_column_stats(yss, levels)
+    yss = np.asarray(yss)
+    if yss.ndim == 1:
+        yss = yss[:, np.newaxis]
+
+    n, k = yss.shape
+    count = np.zeros(k, dtype=np.intp)
+    mean, std, mins, maxs = (np.full(k, np.nan) for _ in range(4))
+    quantiles = np.full((len(levels), k), np.nan)
+    if n == 0:
+        return ColumnStats(count, mean, std, mins, maxs, levels, quantiles)
+
+    for start in range(0, k, chunk_size):
+        columns = slice(start, start + chunk_size)
+        block = np.asarray(yss[:, columns], dtype=np.float64)
+        if len(levels) > 0:
+            # The NaNs are sorted last
+            block = np.sort(block, axis=0)
+        valid = ~np.isnan(block)
+        n_valid = valid.sum(axis=0)
+        count[columns] = n_valid
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block_mean = np.where(valid, block, 0).sum(axis=0) / n_valid
+            mean[columns] = block_mean
+            std[columns] = np.sqrt(np.where(valid, (block - block_mean) ** 2,
+                                            0).sum(axis=0) / n_valid)
+        if len(levels) == 0:
+            mins[columns] = np.fmin.reduce(block, axis=0)
+            maxs[columns] = np.fmax.reduce(block, axis=0)
+            continue
+
+        last = np.maximum(n_valid - 1, 0)
+        mins[columns] = block[0]
+        maxs[columns] = np.take_along_axis(block, last[np.newaxis], 0)[0]
+        for i, level in enumerate(levels):
+            position = last * level
+            below = np.floor(position).astype(np.intp)
+            above = np.minimum(below + 1, last)
+            low = np.take_along_axis(block, below[np.newaxis], 0)[0]
+            high = np.take_along_axis(block, above[np.newaxis], 0)[0]
+            quantiles[i, columns] = low + (high - low) * (position - below)
+    return ColumnStats(count, mean, std, mins, maxs, levels, quantiles)
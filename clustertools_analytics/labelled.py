@@ -0,0 +1,208 @@
+import operator
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import selected_indices
+
+
+class LabelledArray(object):
+    """
+    `LabelledArray`
+    ===============
+    N-d array whose leading axes are labelled by parameter names (`dims`),
+    with the parameter values (the domains) as coordinates (`coords`). The
+    remaining axes are the (unlabelled) axes of the values.
+
+    The reductions and selections are done on the whole array at once, and
+    the arithmetic aligns the operands on their labels (see `align`).
+
+    Example
+    -------
+    >>> losses = MetricOverParameter("loss", "lr", "seed",
+    ...                              labelled=True)(cube)
+    >>> losses.reduce(over="seed", fn=np.nanmean).sel(lr=[1e-3, 1e-4])
+    """
+    # Operations with numpy arrays are left to the reflected operators
+    __array_ufunc__ = None
+
+    def __init__(self, values, dims, coords):
+        self.values = np.asanyarray(values)
+        self.dims = tuple(dims)
+        self.coords = OrderedDict((d, list(coords[d])) for d in self.dims)
+        if self.values.ndim < len(self.dims):
+            raise ValueError("{} dimensions for an array of shape {}"
+                             "".format(len(self.dims), self.values.shape))
+        for size, d in zip(self.values.shape, self.dims):
+            if size != len(self.coords[d]):
+                raise ValueError("{} coordinates for the {} values of '{}'"
+                                 "".format(len(self.coords[d]), size, d))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def ndim(self):
+        return self.values.ndim
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __len__(self):
+        return len(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    def axis(self, dim):
+        try:
+            return self.dims.index(dim)
+        except ValueError:
+            raise ValueError("Unknown dimension '{}' (not in {})"
+                             "".format(dim, self.dims)) from None
+
+    def reduce(self, over, fn=np.nanmean):
+        """
+        Reduce the dimension(s) `over` with `fn`, a function taking an
+        `axis` keyword (e.g. `np.nanmean`, `np.nanmax`)
+        """
+        over = (over,) if isinstance(over, str) else tuple(over)
+        axes = tuple(self.axis(d) for d in over)
+        values = fn(self.values, axis=axes)
+        dims = [d for d in self.dims if d not in over]
+        return self.__class__(values, dims, self.coords)
+
+    def sel(self, **selections):
+        """
+        Select some coordinates of the dimensions (the values are matched by
+        their string or float value). A dimension given a single value is
+        dropped.
+        """
+        for d in selections:
+            self.axis(d)
+        values = self.values
+        dims = []
+        coords = OrderedDict()
+        # Backwards, so that dropping an axis keeps the others in place
+        for i in reversed(range(len(self.dims))):
+            d = self.dims[i]
+            labels = self.coords[d]
+            if d not in selections:
+                dims.append(d)
+                coords[d] = labels
+                continue
+            selected = selections[d]
+            single = isinstance(selected, (str, bytes)) or \
+                not hasattr(selected, "__iter__")
+            indices = selected_indices(labels,
+                                       (selected,) if single else selected)
+            if single:
+                if len(indices) != 1:
+                    raise ValueError("Value {} not found in '{}' ({})"
+                                     "".format(repr(selected), d, labels))
+                values = np.take(values, indices[0], axis=i)
+            else:
+                values = np.take(values, indices, axis=i)
+                dims.append(d)
+                coords[d] = [labels[j] for j in indices]
+        return self.__class__(values, dims[::-1], coords)
+
+    def conform(self, dims, coords, shape):
+        """
+        The values along the dimensions `dims` with the coordinates `coords`
+        (a subset of those of self), broadcast (without copy) along the
+        dimensions self does not have and to the value shape `shape`
+        """
+        values = self.values
+        for i, d in enumerate(self.dims):
+            if self.coords[d] != coords[d]:
+                position = {v: j for j, v in enumerate(self.coords[d])}
+                values = np.take(values, [position[v] for v in coords[d]],
+                                 axis=i)
+        n = len(self.dims)
+        order = [self.dims.index(d) for d in dims if d in self.dims]
+        values = values.transpose(order + list(range(n, values.ndim)))
+        value_shape = values.shape[n:]
+        expanded = [len(coords[d]) if d in self.dims else 1 for d in dims]
+        # The value axes are aligned on the trailing axes of `shape`
+        padding = (1,) * (len(shape) - len(value_shape))
+        values = values.reshape(tuple(expanded) + padding + value_shape)
+        sizes = tuple(len(coords[d]) for d in dims)
+        return np.broadcast_to(values, sizes + tuple(shape))
+
+    def align(self, other):
+        """
+        Return self and `other` (another `LabelledArray`) over the same
+        dimensions (those of self, then the others of `other`): the shared
+        dimensions are restricted to the common coordinates and the others
+        are broadcast (without copy).
+        """
+        dims = self.dims + tuple(d for d in other.dims if d not in self.dims)
+        coords = OrderedDict()
+        for d in dims:
+            if d in self.coords and d in other.coords:
+                theirs = set(other.coords[d])
+                coords[d] = [v for v in self.coords[d] if v in theirs]
+            else:
+                coords[d] = self.coords[d] if d in self.coords else \
+                    other.coords[d]
+        shape = np.broadcast_shapes(self.shape[len(self.dims):],
+                                    other.shape[len(other.dims):])
+        return (self.__class__(self.conform(dims, coords, shape), dims,
+                               coords),
+                self.__class__(other.conform(dims, coords, shape), dims,
+                               coords))
+
+    def apply(self, op, other, reflected=False):
+        if isinstance(other, LabelledArray):
+            a, b = self.align(other)
+            dims, coords, a, b = a.dims, a.coords, a.values, b.values
+        else:
+            dims, coords, a, b = self.dims, self.coords, self.values, other
+        if reflected:
+            a, b = b, a
+        return self.__class__(op(a, b), dims, coords)
+
+    def __add__(self, other):
+        return self.apply(operator.add, other)
+
+    def __radd__(self, other):
+        return self.apply(operator.add, other, reflected=True)
+
+    def __sub__(self, other):
+        return self.apply(operator.sub, other)
+
+    def __rsub__(self, other):
+        return self.apply(operator.sub, other, reflected=True)
+
+    def __mul__(self, other):
+        return self.apply(operator.mul, other)
+
+    def __rmul__(self, other):
+        return self.apply(operator.mul, other, reflected=True)
+
+    def __truediv__(self, other):
+        return self.apply(operator.truediv, other)
+
+    def __rtruediv__(self, other):
+        return self.apply(operator.truediv, other, reflected=True)
+
+    def __neg__(self):
+        return self.__class__(-self.values, self.dims, self.coords)
+
+    def frozen(self):
+        """A read-only view"""
+        values = self.values.view()
+        values.flags.writeable = False
+        return self.__class__(values, self.dims, self.coords)
+
+    def __repr__(self):
+        return "{}(dims={}, shape={}, coords={})" \
+               "".format(self.__class__.__name__, repr(self.dims),
+                         repr(self.shape), repr(dict(self.coords)))
@@ -1,4 +1,6 @@
 import warnings
+from collections import OrderedDict
+
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.axes import Axes
@@ -6,11 +8,43 @@ from matplotlib.figure import Figure
 from matplotlib.patches import Ellipse
 
 from .convention import default_factory
-from .trajectory import TrajectoryDisplayer
-from ..accessor import Accessor
+from .trajectory import TrajectoryDisplayer, fading_colormap
+from ..accessor import Accessor, SeriesBlocks, evaluate_in_pool, \
+    evaluate_fused
+from ..kernels import Moments, column_stats
+from ..profiling import measure
 from ..utils import Ellipse2D
 
 
+STATISTICS = "mean", "median"
+
+
+def check_statistic(statistic):
+    if statistic not in STATISTICS:
+        raise ValueError("Unknown statistic '{}' (expected one of {})"
+                         "".format(statistic, STATISTICS))
+    return statistic
+
+
+def summarize(values, statistic="mean"):
+    """
+    Return the `statistic` ("mean" or "median") of the `values` (NaNs
+    ignored, see `kernels.column_stats`) and its spread: the standard
+    deviation, or the distances [2, 1] to the first and third quartiles
+    (as expected by `errorbar`)
+    """
+    if np.ma.isMaskedArray(values):
+        values = values.astype(np.float64).filled(np.nan)
+    values = np.ravel(values)
+    if check_statistic(statistic) == "mean":
+        stats = column_stats(values)
+        return stats.mean[0], stats.std[0]
+    stats = column_stats(values, levels=(.25, .5, .75))
+    median = stats.median[0]
+    return median, np.array([[median - stats.quantile(.25)[0]],
+                             [stats.quantile(.75)[0] - median]])
+
+
 class Plot2D(object):
     def __init__(self, decorated=None):
         self._fig = None
@@ -34,10 +68,31 @@ class Plot2D(object):
     def axes(self):
         return self._axes
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        """
+        The accessors whose results on a cube are given to `draw_` (in this
+        order). Evaluating them is independent of the figure, so that it can
+        be done in other processes (see `plot`).
+        """
+        return ()
+
+    def draw_(self, cube, *data, **kwargs):
         pass
 
-    def plot(self, *cubes, **kwargs):
+    def plot_(self, cube, **kwargs):
+        data = evaluate_fused(self.accessors_(), cube)
+        self.draw_(cube, *data, **kwargs)
+
+    def plot(self, *cubes, n_jobs=None, **kwargs):
+        """
+        Plot the cubes.
+
+        n_jobs: int or None (default: None)
+            If not None (nor 1), the accessors (see `accessors_`) are first
+            evaluated for all the cubes in a pool of `n_jobs` processes (-1
+            for as many as CPUs). The drawing is then done sequentially, in
+            the order of the cubes. The accessors and cubes must be picklable.
+        """
         filtered_cubes = []
         for cube in cubes:
             if len(cube) == 0:
@@ -48,24 +103,40 @@ class Plot2D(object):
                 filtered_cubes.append(cube)
 
         if self._decorated is not None:
-            self._decorated.plot(*filtered_cubes, **kwargs)
+            self._decorated.plot(*filtered_cubes, n_jobs=n_jobs, **kwargs)
 
-        self.plot_all_(filtered_cubes, **kwargs)
+        self.plot_all_(filtered_cubes, n_jobs=n_jobs, **kwargs)
         return self
 
-    def plot_all_(self, filtered_cubes, **kwargs):
-        for cube in filtered_cubes:
-            try:
-                self.plot_(cube, **kwargs)
-            except Exception as e:
-                raise ValueError("Error with cube '{}' ({})"
-                                 "".format(cube.name,
-                                           self.__class__.__name__)) from e
+    def plot_all_(self, filtered_cubes, n_jobs=None, **kwargs):
+        accessors = self.accessors_()
+        if n_jobs in (None, 1) or len(accessors) == 0 or \
+                len(filtered_cubes) < 2:
+            for cube in filtered_cubes:
+                try:
+                    with measure("plot", self, cube):
+                        self.plot_(cube, **kwargs)
+                except Exception as e:
+                    raise ValueError("Error with cube '{}' ({})"
+                                     "".format(cube.name,
+                                               self.__class__.__name__)) from e
+        else:
+            results = evaluate_in_pool(accessors, filtered_cubes, n_jobs)
+            for cube, result in zip(filtered_cubes, results):
+                try:
+                    with measure("plot", self, cube):
+                        self.draw_(cube, *result.result(), **kwargs)
+                except Exception as e:
+                    raise ValueError("Error with cube '{}' ({})"
+                                     "".format(cube.name,
+                                               self.__class__.__name__)) from e
 
         try:
             if self._decorated is not None:
-                self._decorated.pack()
-            self.pack()
+                with measure("pack", self._decorated):
+                    self._decorated.pack()
+            with measure("pack", self):
+                self.pack()
         except Exception as e:
             raise ValueError("Error while packing ({})"
                              "".format(self.__class__.__name__)) from e
@@ -92,27 +163,100 @@ class LegendeablePlot(Plot2D):
 
 
 class ScatterPlot(LegendeablePlot):
+    """
+    `ScatterPlot`
+    =============
+    Plots the ys against the xs of each cube (a scalar x is shared by all
+    the ys).
+
+    If `max_points` is given, the points are drawn once all the cubes are
+    plotted (see `pack`): the cubes with the same convention (label, color,
+    marker and alpha, the color being set) are drawn as a single
+    collection, or, if they have more than `max_points` points, as their
+    density over `gridsize` hexagonal bins (see `Axes.hexbin`), which does
+    not grow with the number of points.
+    """
     def __init__(self, x_accessor, y_accessor,
-                 convention_factory=None, decorated=None):
+                 convention_factory=None, decorated=None, max_points=None,
+                 gridsize=100):
         super().__init__(decorated=decorated,
                          convention_factory=convention_factory)
         self._get_x = x_accessor
         self._get_y = y_accessor
+        self.max_points = max_points
+        self.gridsize = gridsize
+        self._groups = OrderedDict()
 
-    def plot_(self, cube, **kwargs):
-        convention = self.create_convention(cube)
+    def accessors_(self):
+        return self._get_x, self._get_y
 
-        xs = self._get_x(cube)
-        ys = self._get_y(cube)
+    def draw_(self, cube, xs, ys, **kwargs):
+        convention = self.create_convention(cube)
 
+        xs = np.asarray(xs)
         if xs.ndim == 0:
-            # Same x for all ys
-            xs = np.ones(ys.shape, dtype=xs.dtype) * xs
+            # Same x for all ys (a read-only view rather than a copy)
+            xs = np.broadcast_to(xs, np.shape(ys))
+
+        if self.max_points is None:
+            self.axes.scatter(xs, ys, color=convention.color,
+                              marker=convention.marker,
+                              label=convention.label,
+                              alpha=convention.alpha)
+            return
+
+        key = convention.label, repr(convention.color), convention.marker, \
+            convention.alpha
+        if convention.color is None:
+            # Each cube takes the next color
+            key += len(self._groups),
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = convention, [], []
+        group[1].append(xs)
+        group[2].append(ys)
 
-        self.axes.scatter(xs, ys, color=convention.color,
-                          marker=convention.marker,
-                          label=convention.label,
-                          alpha=convention.alpha)
+    def pack(self):
+        groups = [(convention, np.concatenate([np.ravel(xs) for xs in xss]),
+                   np.concatenate([np.ravel(ys) for ys in yss]))
+                  for convention, xss, yss in self._groups.values()]
+        self._groups = OrderedDict()
+
+        # The hexagonal grids of the dense groups are the same
+        dense = [(xs, ys) for _, xs, ys in groups if len(ys) > self.max_points]
+        extent = None
+        if len(dense) > 0:
+            xs = np.concatenate([xs for xs, _ in dense])
+            ys = np.concatenate([ys for _, ys in dense])
+            finite = np.isfinite(xs) & np.isfinite(ys)
+            if finite.any():
+                x_min, x_max = xs[finite].min(), xs[finite].max()
+                y_min, y_max = ys[finite].min(), ys[finite].max()
+                # Degenerate extents are widened
+                if x_min == x_max:
+                    x_min, x_max = x_min - .5, x_max + .5
+                if y_min == y_max:
+                    y_min, y_max = y_min - .5, y_max + .5
+                extent = x_min, x_max, y_min, y_max
+
+        for convention, xs, ys in groups:
+            if len(ys) > self.max_points:
+                self.draw_density(xs, ys, convention, extent)
+            else:
+                self.axes.scatter(xs, ys, color=convention.color,
+                                  marker=convention.marker,
+                                  label=convention.label,
+                                  alpha=convention.alpha)
+
+    def draw_density(self, xs, ys, convention, extent):
+        finite = np.isfinite(xs) & np.isfinite(ys)
+        if not finite.any():
+            return
+        cmap = None if convention.color is None else \
+            fading_colormap(convention.color, .1)
+        self.axes.hexbin(xs[finite], ys[finite], gridsize=self.gridsize,
+                         extent=extent, mincnt=1, bins="log", cmap=cmap,
+                         label=convention.label, alpha=convention.alpha)
 
 
 class DispersionEllipse(LegendeablePlot):
@@ -137,11 +281,11 @@ class DispersionEllipse(LegendeablePlot):
         self.ellipse_alphactor = ellipse_alphactor
         self.ellipses = []
 
-    def plot_(self, cube, **kwargs):
-        convention = self.create_convention(cube)
+    def accessors_(self):
+        return self._get_x, self._get_y
 
-        xs = self._get_x(cube)
-        ys = self._get_y(cube)
+    def draw_(self, cube, xs, ys, **kwargs):
+        convention = self.create_convention(cube)
 
         if xs.ndim == 0:
             # Same x for all ys
@@ -187,38 +331,56 @@ class TrajectoryPlot(LegendeablePlot):
             trajectory_displayer = TrajectoryDisplayer()
         self._trajectory_displayer = trajectory_displayer
 
-    def plot_(self, cube, **kwargs):
-        res = self.data_accessor(cube)
+    def accessors_(self):
+        return self.data_accessor,
+
+    def draw_(self, cube, res, **kwargs):
+        if isinstance(res, SeriesBlocks):
+            convention = self.create_convention(cube)
+            self._trajectory_displayer.display_blocks(self.axes, res,
+                                                      convention)
+            return
+
         if self.data_accessor.n_outputs == 1:
             yss = res
             xs = np.arange(len(yss))
         else:
             xs, yss = res
         convention = self.create_convention(cube)
+        if isinstance(yss, Moments):
+            self._trajectory_displayer.display_moments(self.axes, xs, yss,
+                                                       convention)
+            return
         self._trajectory_displayer(self.axes, xs, yss, convention)
 
 
 class BarPlot(LegendeablePlot):
     """
-    Plot as bar plot
+    Plot as bar plot: the mean of the values with their standard deviation
+    as error bar, or (`statistic="median"`) their median with their
+    interquartile range
     """
 
     def __init__(self, height_accessor, vertical=True,
-                 convention_factory=None, decorated=None):
+                 convention_factory=None, decorated=None, statistic="mean"):
         super().__init__(decorated=decorated,
                          convention_factory=convention_factory)
         self.height_accessor = height_accessor
+        self.statistic = check_statistic(statistic)
         self._curr_bar = 0
         self._vertical = vertical
         self._bottoms = []
         self._stack = False
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        return self.height_accessor,
+
+    def draw_(self, cube, values, **kwargs):
         convention = self.create_convention(cube)
-        values = self.height_accessor(cube)
         xs = [self._curr_bar]
-        ys = [values.mean()]
-        std = [values.std()]
+        height, spread = summarize(values, self.statistic)
+        ys = [height]
+        std = [spread] if np.ndim(spread) == 0 else spread
 
         if self._stack:
             bottom = self._bottoms[self._curr_bar]
@@ -285,9 +447,11 @@ class HistogramPlot(LegendeablePlot):
         self.density = density
         self.cumulative = cumulative
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        return self.distrib_accessor,
+
+    def draw_(self, cube, distribution, **kwargs):
         convention = self.create_convention(cube)
-        distribution = self.distrib_accessor(cube)
 
         weights = None
         if self.density:
@@ -315,9 +479,11 @@ class BoxPlot(LegendeablePlot):
         self.distribs = []
         self.labels = []
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        return self.distrib_accessor,
+
+    def draw_(self, cube, distribution, **kwargs):
         convention = self.create_convention(cube)
-        distribution = self.distrib_accessor(cube)
 
         distribution = distribution.squeeze()
 
@@ -356,47 +522,67 @@ class ScatterSpaceHz(ScatterPlot):
         self.axes.set_xlim(0, 1)
         self.axes.set_xticks([])
 
-    def plot_(self, cube, **kwargs):
-        super().plot_(cube, **kwargs)
+    def accessors_(self):
+        # The spacer is stateful: it is evaluated while drawing
+        return self._get_y,
+
+    def draw_(self, cube, ys, **kwargs):
+        super().draw_(cube, self._get_x(cube), ys, **kwargs)
         self._get_x.increment()  # Ugly catch
 
 
 class HorizontalLine(LegendeablePlot):
+    """
+    Draws the mean (or the median, with `statistic="median"`) of the values
+    as a horizontal line
+    """
     def __init__(self, y_accessor, convention_factory=None, decorated=None,
-                 linestyle=None, alpha=1, linewidth=None):
+                 linestyle=None, alpha=1, linewidth=None, statistic="mean"):
         super().__init__(decorated=decorated,
                          convention_factory=convention_factory)
         self.y_accessor = y_accessor
+        self.statistic = check_statistic(statistic)
         self.linestyle = linestyle
         self.alpha = alpha
         self.linewidth = linewidth
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        return self.y_accessor,
+
+    def draw_(self, cube, ys, **kwargs):
         convention = self.create_convention(cube)
-        ys = self.y_accessor(cube)
         linestyle = convention.linestyle if self.linestyle is None else \
             self.linestyle
-        self.axes.axhline(np.nanmean(ys), color=convention.color,
+        self.axes.axhline(summarize(ys, self.statistic)[0],
+                          color=convention.color,
                           alpha=self.alpha, linestyle=linestyle,
                           linewidth=self.linewidth, label=convention.label)
 
 
 class VerticalLine(LegendeablePlot):
+    """
+    Draws the mean (or the median, with `statistic="median"`) of the values
+    as a vertical line
+    """
     def __init__(self, y_accessor, convention_factory=None, decorated=None,
-                 linestyle=None, alpha=1, linewidth=None):
+                 linestyle=None, alpha=1, linewidth=None, statistic="mean"):
         super().__init__(decorated=decorated,
                          convention_factory=convention_factory)
         self.y_accessor = y_accessor
+        self.statistic = check_statistic(statistic)
         self.linestyle = linestyle
         self.alpha = alpha
         self.linewidth = linewidth
 
-    def plot_(self, cube, **kwargs):
+    def accessors_(self):
+        return self.y_accessor,
+
+    def draw_(self, cube, ys, **kwargs):
         convention = self.create_convention(cube)
-        ys = self.y_accessor(cube)
         linestyle = convention.linestyle if self.linestyle is None else \
             self.linestyle
-        self.axes.axvline(np.nanmean(ys), color=convention.color,
+        self.axes.axvline(summarize(ys, self.statistic)[0],
+                          color=convention.color,
                           alpha=self.alpha, linestyle=linestyle,
                           linewidth=self.linewidth)
 
@@ -410,11 +596,10 @@ class CorrelationPlot(Plot2D):
         self.colorbar = colorbar
 
 
-    def plot_(self, cube, **kwargs):
-        row_is_variable = [
-            access(cube) for access in self.distrib_accessors
-        ]
+    def accessors_(self):
+        return tuple(self.distrib_accessors)
 
+    def draw_(self, cube, *row_is_variable, **kwargs):
         corr = np.corrcoef(np.array(row_is_variable))
 
         im = self.axes.imshow(corr, cmap=self.colormap, vmin=-1, vmax=1)
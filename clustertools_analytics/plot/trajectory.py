@@ -1,4 +1,10 @@
+from itertools import chain
+
 import numpy as np
+from matplotlib.colors import LinearSegmentedColormap, to_rgba
+
+from ..kernels import Moments, RaggedSeries, ColumnStats, column_stats, \
+    column_xs, longest_xs
 
 def filter_nans(ref, *others):
     nan = np.isnan(ref)
@@ -13,8 +19,95 @@ def filter_nans(ref, *others):
     return tuple([ref[mask]] + [o[mask] for o in others])
 
 
+def valid_segments(xs, yss):
+    """
+    Gather the non-NaN points of all the rows of `yss` at once. The
+    abscissa `xs` is either shared [k] or given per row ([n, k] or
+    `RaggedSeries`). The rows of a `RaggedSeries` use the first values of a
+    shared abscissa.
+
+    Return
+    ------
+    xs, ys: np.array [m]
+        The non-NaN points, row after row
+    offsets: np.array [s+1]
+        The points of the ith non-empty row are in `offsets[i]:offsets[i+1]`
+    or None if `yss` is neither a `RaggedSeries` nor a numerical [n, k] block
+    """
+    if isinstance(yss, RaggedSeries):
+        ys = yss.values
+        if isinstance(xs, RaggedSeries):
+            xs = xs.values
+        else:
+            xs = np.asarray(xs)[yss.column_indices()]
+        offsets = yss.offsets
+    else:
+        ys = np.asarray(yss)
+        if ys.ndim != 2 or ys.dtype.kind not in "fiu" or \
+                isinstance(xs, RaggedSeries):
+            return None
+        xs = np.broadcast_to(xs, ys.shape)
+        offsets = np.arange(ys.shape[0] + 1) * ys.shape[1]
+        xs, ys = xs.reshape(-1), ys.reshape(-1)
+
+    valid = ~np.isnan(ys)
+    if not valid.all():
+        # Index of the row of the kept points
+        rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))[valid]
+        xs, ys = xs[valid], ys[valid]
+        offsets = np.searchsorted(rows, np.arange(len(offsets)))
+    # Without the empty rows
+    keep = np.concatenate(([True], offsets[1:] != offsets[:-1]))
+    return xs, ys, offsets[keep]
+
+
+def nan_broken(xs, yss):
+    """
+    Yield the rows of `yss` (see `valid_segments`) without their NaNs as
+    a single path (xs, ys), where the rows are separated by NaNs (so that
+    they are drawn as one artist). Yield nothing if all the values are NaN.
+    """
+    segments = valid_segments(xs, yss)
+    if segments is None:
+        yield from nan_separated(filter_nans_rows(xs, yss))
+        return
+    xs, ys, offsets = segments
+    if len(ys) == 0:
+        return
+    breaks = offsets[1:-1]
+    # The NaN breaks need floating point buffers (e.g. for integer blocks)
+    yield np.insert(xs.astype(float, copy=False), breaks, np.nan), \
+        np.insert(ys.astype(float, copy=False), breaks, np.nan)
+
+
 def filter_nans_yss(xs, yss):
-    for ys in yss:
+    """
+    Yield the (xs, ys) pairs of the rows of `yss` without their NaNs. The
+    abscissa `xs` is either shared [k] or given per row ([n, k] or
+    `RaggedSeries`). The rows of a `RaggedSeries` use the first values of a
+    shared abscissa.
+
+    The NaNs of the whole block are filtered at once (see
+    `valid_segments`): the pairs are slices of the same buffers.
+    """
+    segments = valid_segments(xs, yss)
+    if segments is None:
+        yield from filter_nans_rows(xs, yss)
+        return
+    xs, ys, offsets = segments
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        yield xs[start:end], ys[start:end]
+
+
+def filter_nans_rows(xs, yss):
+    """`filter_nans_yss`, row by row (e.g. for lists of rows)"""
+    if isinstance(xs, RaggedSeries) or np.ndim(xs) == 2:
+        xss = xs
+    elif isinstance(yss, RaggedSeries):
+        xss = [xs[:length] for length in yss.lengths]
+    else:
+        xss = [xs] * len(yss)
+    for xs, ys in zip(xss, yss):
         nan = np.isnan(ys)
         if nan.all():  # Skip all
             continue
@@ -26,9 +119,74 @@ def filter_nans_yss(xs, yss):
             yield xs, ys
 
 
+def valid_points(xs, yss):
+    """The (xs, ys) non-NaN points of all the rows of `yss`, flattened"""
+    segments = valid_segments(xs, yss)
+    if segments is not None:
+        return segments[:2]
+    pairs = list(filter_nans_rows(xs, yss))
+    if len(pairs) == 0:
+        return np.empty(0), np.empty(0)
+    return np.concatenate([xs for xs, _ in pairs]), \
+        np.concatenate([ys for _, ys in pairs])
+
+
+def row_chunks(xs, yss, chunk_size):
+    """Yield the (xs, yss) blocks of (at most) `chunk_size` rows of `yss`"""
+    for start in range(0, len(yss), chunk_size):
+        stop = start + chunk_size
+        if isinstance(yss, RaggedSeries):
+            chunk = yss.rows(start, stop)
+        else:
+            chunk = yss[start:stop]
+        if isinstance(xs, RaggedSeries):
+            yield xs.rows(start, stop), chunk
+        elif np.ndim(xs) == 2:
+            yield xs[start:stop], chunk
+        else:
+            yield xs, chunk
+
+
+def fading_colormap(color, alpha=0.):
+    """Colormap from `color` with opacity `alpha` to opaque `color`"""
+    return LinearSegmentedColormap.from_list(
+        "fading", [to_rgba(color, alpha), to_rgba(color, 1)])
+
+
+def stack_rows(blocks):
+    """The rows of the `blocks` (arrays [n_i, k] or `RaggedSeries`)"""
+    if any(isinstance(yss, RaggedSeries) for yss in blocks):
+        return RaggedSeries.from_rows([ys for yss in blocks for ys in yss],
+                                      dtype=np.float64)
+    return np.concatenate(blocks)
+
+
+def nan_separated(pairs):
+    """
+    Concatenate the (xs, ys) `pairs` into a single path (xs, ys) where the
+    series are separated by NaNs, so that they are drawn as one artist.
+    Yield nothing if there are no pairs.
+    """
+    xss = []
+    yss = []
+    for xs, ys in pairs:
+        xss.extend((xs, [np.nan]))
+        yss.extend((ys, [np.nan]))
+    if len(xss) > 0:
+        yield np.concatenate(xss[:-1]), np.concatenate(yss[:-1])
+
+
 class TrajectoryDisplayer(object):
-    def __init__(self):
+    """
+    `TrajectoryDisplayer`
+    =====================
+    Draws each series as a line. If `batched`, all the series of a cube
+    are drawn as a single NaN-separated line (one artist rather than one
+    per series, which is much faster to draw and save for many series).
+    """
+    def __init__(self, batched=False):
         self.label2color = {}
+        self.batched = batched
 
 
     def get_color(self, color, label):
@@ -50,7 +208,15 @@ class TrajectoryDisplayer(object):
         yss: list [n, k]
             The ys to aggregate
         """
-        for xs, ys in filter_nans_yss(xs, yss):
+        self.display_pairs(ax, self.lines(xs, yss), convention)
+
+    def lines(self, xs, yss):
+        """The (xs, ys) lines to draw for the series `yss` (see `batched`)"""
+        return nan_broken(xs, yss) if self.batched else \
+            filter_nans_yss(xs, yss)
+
+    def display_pairs(self, ax, pairs, convention):
+        for xs, ys in pairs:
             color = convention.color
             label = convention.label
 
@@ -65,26 +231,118 @@ class TrajectoryDisplayer(object):
 
             self.memorize_color(color, label)
 
-
+    def display_blocks(self, ax, blocks, convention):
+        """
+        Display the series given as an iterable of (xs, yss_chunk) blocks
+        (see `accessor.ChunkedSeries`)
+        """
+        if self.batched:
+            self.display_pairs(ax, nan_separated(
+                pair for xs, yss in blocks for pair in nan_broken(xs, yss)
+            ), convention)
+            return
+        for xs, yss in blocks:
+            self(ax, xs, yss, convention)
+
+    def display_moments(self, ax, xs, moments, convention):
+        """
+        Display precomputed statistics of the series (see `kernels.Moments`,
+        `accessor.SeriesMoments`). The series themselves are not available:
+        their mean is displayed.
+        """
+        self(ax, xs, moments.mean[np.newaxis, :], convention)
 
 
 
 class MinMaxMeanTrajectory(TrajectoryDisplayer):
-    def __init__(self, display_all=True):
-        super().__init__()
+    """
+    `MinMaxMeanTrajectory`
+    ======================
+    Draws the mean of the series within a band from their min to their max
+    (and the series themselves if `display_all`). If `quantiles` is a pair
+    of levels, e.g. (0.25, 0.75) for the interquartile range, the band goes
+    between those quantiles around the median instead.
+
+    The statistics are computed in one pass (see `kernels.column_stats`).
+    Streamed blocks (see `display_blocks`) are held in memory to compute
+    quantiles; precomputed moments (see `display_moments`) have none, so
+    that their min/max band is drawn.
+    """
+    def __init__(self, display_all=True, batched=False, quantiles=None):
+        super().__init__(batched=batched)
         self.display_all = display_all
+        if quantiles is not None:
+            quantiles = tuple(quantiles)
+            if len(quantiles) != 2:
+                raise ValueError("Expected the pair of levels of the band "
+                                 "(got {})".format(quantiles))
+        self.quantiles = quantiles
+
+    @property
+    def levels(self):
+        """The quantile levels to compute"""
+        if self.quantiles is None:
+            return ()
+        low, high = self.quantiles
+        return low, .5, high
 
     def __call__(self, ax, xs, yss, convention):
-        mins = np.nanmin(yss, axis=0)
-        maxs = np.nanmax(yss, axis=0)
-        means = np.nanmean(yss, axis=0)
+        stats = column_stats(yss, self.levels)
+        band_xs = column_xs(xs, yss) if isinstance(yss, RaggedSeries) \
+            else xs
+        color = self.display_stats(ax, band_xs, stats, convention)
 
+        if self.display_all:
+            self.display_series(ax, xs, yss, convention, color)
+
+    def display_blocks(self, ax, blocks, convention):
+        color = self.get_color(convention.color, convention.label)
+        moments = Moments()
+        kept = []
+        band_xs = None
+        pairs = []
+        for xs, yss in blocks:
+            if self.quantiles is None:
+                moments.update(yss)
+            else:
+                kept.append(yss)
+            band_xs = longest_xs(band_xs, xs, yss)
+            if not self.display_all:
+                continue
+            if self.batched:
+                # Drawn all at once
+                pairs.extend(nan_broken(xs, yss))
+            else:
+                color = self.display_series(ax, xs, yss, convention, color)
+
+        if band_xs is not None:
+            stats = ColumnStats.from_moments(moments) if len(kept) == 0 \
+                else column_stats(stack_rows(kept), self.levels)
+            color = self.display_stats(ax, band_xs, stats, convention, color)
+        if len(pairs) > 0:
+            self.display_pairs_faded(ax, nan_separated(pairs), convention,
+                                     color)
+
+    def display_moments(self, ax, xs, moments, convention):
+        self.display_band(ax, xs, moments.mean, moments.min, moments.max,
+                          convention)
+
+    def display_stats(self, ax, xs, stats, convention, color=None):
+        """Display the band of the `kernels.ColumnStats` `stats`"""
+        if self.quantiles is None:
+            return self.display_band(ax, xs, stats.mean, stats.min,
+                                     stats.max, convention, color)
+        low, high = self.quantiles
+        return self.display_band(ax, xs, stats.median, stats.quantile(low),
+                                 stats.quantile(high), convention, color)
+
+    def display_band(self, ax, xs, means, mins, maxs, convention,
+                     color=None):
         means, mins, maxs, xs_ = filter_nans(means, mins, maxs, xs)
 
-        color = convention.color
         label = convention.label
-
-        color = self.get_color(color, label)
+        if color is None:
+            color = self.get_color(convention.color, label)
 
         l = ax.plot(xs_, means, color=color,
                     label=label if label not in self.label2color else None,
@@ -101,24 +359,163 @@ class MinMaxMeanTrajectory(TrajectoryDisplayer):
                         facecolor=color,
                         alpha=.5*convention.alpha,
                         zorder=0)
+        return color
 
+    def display_series(self, ax, xs, yss, convention, color):
+        return self.display_pairs_faded(ax, self.lines(xs, yss), convention,
+                                        color)
 
-
-        if self.display_all:
-            for xs, ys in filter_nans_yss(xs, yss):
-                ax.plot(xs, ys,
+    def display_pairs_faded(self, ax, pairs, convention, color):
+        for xs, ys in pairs:
+            l = ax.plot(xs, ys,
                         color=color, alpha=.1*convention.alpha,
                         linestyle=convention.linestyle,
-                        zorder=1)
+                        zorder=1)[0]
+            if color is None:
+                color = l.get_c()
+        return color
 
 
 class StdBarTrajectory(TrajectoryDisplayer):
     def __call__(self, ax, xs, yss, convention):
-        means = np.nanmean(yss, axis=0)
-        stds = np.nanstd(yss, axis=0)
+        if isinstance(yss, RaggedSeries):
+            xs = column_xs(xs, yss)
+        stats = column_stats(yss)
+
+        self.display_errorbar(ax, xs, stats.mean, stats.std, convention)
+
+    def display_blocks(self, ax, blocks, convention):
+        moments = Moments()
+        band_xs = None
+        for xs, yss in blocks:
+            moments.update(yss)
+            band_xs = longest_xs(band_xs, xs, yss)
 
+        if band_xs is not None:
+            self.display_moments(ax, band_xs, moments, convention)
+
+    def display_moments(self, ax, xs, moments, convention):
+        self.display_errorbar(ax, xs, moments.mean, moments.std, convention)
+
+    def display_errorbar(self, ax, xs, means, stds, convention):
         means, stds, xs = filter_nans(means, stds, xs)
 
         ax.errorbar(xs, means, yerr=stds,
                     color=convention.color, label=convention.label,
-                    linestyle=convention.linestyle, alpha=convention.alpha)
\ No newline at end of file
+                    linestyle=convention.linestyle, alpha=convention.alpha)
+
+
+class DensityTrajectory(TrajectoryDisplayer):
+    """
+    `DensityTrajectory`
+    ===================
+    Rasterizes the points of the series in a 2D histogram over `bins` (x, y)
+    bins, drawn as a single image: the drawing time and file size depend on
+    the number of bins, not on the number of series. The mean series is
+    drawn on top if `display_mean`.
+
+    The histogram is accumulated `chunk_size` rows at a time. Its `extent`
+    (x_min, x_max, y_min, y_max) is the one of the points, unless given:
+    streamed blocks (see `display_blocks`) are only held in memory in the
+    former case. With a shared abscissa, there are at most as many x bins
+    as columns.
+
+    The image goes from transparent to the color of the series, unless a
+    `cmap` is given. `norm` (e.g. `matplotlib.colors.LogNorm()`) scales the
+    counts.
+    """
+    def __init__(self, bins=(256, 128), extent=None, display_mean=True,
+                 cmap=None, norm=None, chunk_size=1024):
+        super().__init__()
+        self.bins = (bins, bins) if np.isscalar(bins) else tuple(bins)
+        self.extent = extent
+        self.display_mean = display_mean
+        self.cmap = cmap
+        self.norm = norm
+        self.chunk_size = chunk_size
+
+    def __call__(self, ax, xs, yss, convention):
+        self.display_blocks(ax, [(xs, yss)], convention)
+
+    def display_blocks(self, ax, blocks, convention):
+        blocks = iter(blocks)
+        first = next(blocks, None)
+        if first is None:
+            return
+        blocks = chain([first], blocks)
+
+        extent = self.extent
+        if extent is None:
+            blocks = list(blocks)
+            extent = self.find_extent(blocks)
+            if extent is None:  # Only NaNs
+                return
+
+        xs, yss = first
+        n_x_bins = self.bins[0]
+        if np.ndim(xs) == 1:
+            n_x_bins = min(n_x_bins, len(xs))
+        bins = n_x_bins, self.bins[1]
+        ranges = extent[:2], extent[2:]
+
+        counts = np.zeros(bins)
+        moments = Moments()
+        band_xs = None
+        for xs, yss in blocks:
+            if self.display_mean:
+                moments.update(yss)
+                band_xs = longest_xs(band_xs, xs, yss)
+            for xs_chunk, yss_chunk in row_chunks(xs, yss, self.chunk_size):
+                px, py = valid_points(xs_chunk, yss_chunk)
+                counts += np.histogram2d(px, py, bins=bins, range=ranges)[0]
+
+        means = None if band_xs is None else moments.mean
+        self.display_density(ax, counts, extent, band_xs, means, convention)
+
+    def display_moments(self, ax, xs, moments, convention):
+        # The series themselves are not available
+        self.display_density(ax, None, None, xs, moments.mean, convention)
+
+    def find_extent(self, blocks):
+        """The (x_min, x_max, y_min, y_max) extent of the points"""
+        extent = None
+        for xs, yss in blocks:
+            px, py = valid_points(xs, yss)
+            if len(px) == 0:
+                continue
+            block = px.min(), px.max(), py.min(), py.max()
+            extent = block if extent is None else \
+                (min(extent[0], block[0]), max(extent[1], block[1]),
+                 min(extent[2], block[2]), max(extent[3], block[3]))
+        if extent is None:
+            return None
+        x_min, x_max, y_min, y_max = (float(v) for v in extent)
+        # Degenerate extents are widened
+        if x_min == x_max:
+            x_min, x_max = x_min - .5, x_max + .5
+        if y_min == y_max:
+            y_min, y_max = y_min - .5, y_max + .5
+        return x_min, x_max, y_min, y_max
+
+    def display_density(self, ax, counts, extent, xs, means, convention):
+        label = convention.label
+        color = self.get_color(convention.color, label)
+
+        # The mean, or an empty line carrying the color and legend entry
+        line_xs, line_ys = [], []
+        if means is not None:
+            line_ys, line_xs = filter_nans(means, xs)
+        l = ax.plot(line_xs, line_ys, color=color,
+                    label=label if label not in self.label2color else None,
+                    linestyle=convention.linestyle, alpha=convention.alpha,
+                    zorder=2)[0]
+        color = l.get_color()
+        self.memorize_color(color, label)
+
+        if counts is None:
+            return
+        cmap = fading_colormap(color) if self.cmap is None else self.cmap
+        ax.imshow(np.ma.masked_equal(counts.T, 0), origin="lower",
+                  extent=extent, aspect="auto", interpolation="nearest",
+                  cmap=cmap, norm=self.norm, alpha=convention.alpha,
+                  zorder=0)
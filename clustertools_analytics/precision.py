@@ -0,0 +1,30 @@
+import numpy as np
+
+
+_default_dtype = np.dtype(np.float64)
+
+
+def get_default_dtype():
+    """Return the dtype of the accessor results without a dtype override"""
+    return _default_dtype
+
+
+def set_default_dtype(dtype):
+    """
+    Make `dtype` (e.g. `np.float32`, which halves the memory of the
+    results) the dtype of the accessor results without a dtype override.
+    Return the previous one.
+    """
+    global _default_dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError("The default dtype must be a floating point one "
+                         "(got '{}')".format(dtype))
+    previous = _default_dtype
+    _default_dtype = dtype
+    return previous
+
+
+def resolve_dtype(dtype):
+    """Return `dtype` or the default dtype if it is None"""
+    return _default_dtype if dtype is None else np.dtype(dtype)
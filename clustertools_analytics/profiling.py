@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+from .cache import size_of
+
+
+_active_profiler = None
+
+
+def get_profiler():
+    """Return the profiler currently recording (or None)"""
+    return _active_profiler
+
+
+def set_profiler(profiler):
+    """
+    Make `profiler` the one recording (None to disable profiling). Return
+    the previous one.
+    """
+    global _active_profiler
+    previous = _active_profiler
+    _active_profiler = profiler
+    return previous
+
+
+_NOT_MEASURED = nullcontext()
+
+
+def measure(kind, obj, cube=None):
+    """
+    Context manager recording the time of its block in the active profiler
+    (nothing if there is none)
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        return _NOT_MEASURED
+    return profiler.measure(kind, obj, cube)
+
+
+class Record(object):
+    """Aggregated measures of one (kind, name, cube) triplet"""
+    def __init__(self):
+        self.n_calls = 0
+        self.total_time = 0.
+        self.n_bytes = 0
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.n_calls if self.n_calls > 0 else 0.
+
+
+class Profiler(object):
+    """
+    `Profiler`
+    ==========
+    Records the wall time, number of calls and output bytes of
+    - the accessors (kind "access"), per accessor class and cube name;
+    - the plots `plot_`/`draw_` (kind "plot") and `pack` (kind "pack"), per
+      `Plot2D` subclass;
+    - the pages written by `PDFSaver` (kind "save").
+
+    Times are inclusive (an accessor time contains the ones of its
+    children). When no profiler is active, the hooks cost one global lookup.
+
+    Example
+    -------
+    >>> with Profiler() as profiler:
+    ...     plot.plot(*cubes)
+    >>> print(profiler.table(sort_by="total_time"))
+    >>> profiler.dump_trace("report_trace.json")  # chrome://tracing format
+    """
+    COLUMNS = ("kind", "name", "cube", "n_calls", "total_time", "mean_time",
+               "n_bytes")
+
+    def __init__(self, keep_events=True):
+        self.records = OrderedDict()
+        self.keep_events = keep_events
+        self.events = []
+        self._origin = perf_counter()
+        self._previous = None
+
+    def record(self, kind, name, cube_name, start, duration, n_bytes=0):
+        key = kind, name, cube_name
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = Record()
+        record.n_calls += 1
+        record.total_time += duration
+        record.n_bytes += n_bytes
+
+        if self.keep_events:
+            self.events.append((kind, name, cube_name, start, duration,
+                                n_bytes, threading.get_ident()))
+
+    @contextmanager
+    def measure(self, kind, obj, cube=None):
+        """Record the time of the `with` block"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, obj.__class__.__name__,
+                        getattr(cube, "name", None), start,
+                        perf_counter() - start)
+
+    def measure_call(self, kind, obj, cube, function, *args):
+        """Record the time and output bytes of `function(*args)`"""
+        start = perf_counter()
+        value = function(*args)
+        duration = perf_counter() - start
+        self.record(kind, obj.__class__.__name__,
+                    getattr(cube, "name", None), start, duration,
+                    size_of(value))
+        return value
+
+    def rows(self, sort_by="total_time", reverse=True):
+        """
+        Return the records as a list of tuples (see `COLUMNS`), sorted by
+        the column `sort_by`
+        """
+        rows = [(kind, name, cube_name, r.n_calls, r.total_time,
+                 r.mean_time, r.n_bytes)
+                for (kind, name, cube_name), r in self.records.items()]
+        index = self.COLUMNS.index(sort_by)
+        return sorted(rows, key=lambda row: (row[index] is None,
+                                             row[index]),
+                      reverse=reverse)
+
+    def table(self, sort_by="total_time", reverse=True, separator="\t"):
+        lines = [separator.join(self.COLUMNS)]
+        for row in self.rows(sort_by, reverse):
+            kind, name, cube_name, n_calls, total, mean, n_bytes = row
+            lines.append(separator.join([
+                kind, name, str(cube_name), str(n_calls),
+                "{:.6f}".format(total), "{:.6f}".format(mean), str(n_bytes)
+            ]))
+        return "\n".join(lines)
+
+    def to_trace(self):
+        """
+        The events in the Trace Event Format (chrome://tracing, Perfetto,
+        speedscope)
+        """
+        pid = os.getpid()
+        events = []
+        for kind, name, cube_name, start, duration, n_bytes, tid in \
+                self.events:
+            events.append({
+                "name": name if cube_name is None else
+                "{} ({})".format(name, cube_name),
+                "cat": kind,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {"cube": cube_name, "n_bytes": n_bytes},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_trace(self, fpath):
+        with open(fpath, "w") as hdl:
+            json.dump(self.to_trace(), hdl)
+
+    def dump_json(self, fpath, sort_by="total_time"):
+        """Dump the aggregated records as a JSON list of objects"""
+        with open(fpath, "w") as hdl:
+            json.dump([dict(zip(self.COLUMNS, row))
+                       for row in self.rows(sort_by)], hdl, indent=1)
+
+    def clear(self):
+        self.records.clear()
+        self.events = []
+        self._origin = perf_counter()
+
+    def __enter__(self):
+        self._previous = set_profiler(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        set_profiler(self._previous)
+        self._previous = None
+
+    def __str__(self):
+        return self.table()
@@ -1,5 +1,6 @@
 import os
 import warnings
+from collections import OrderedDict
 from contextlib import contextmanager
 
 import numpy as np
@@ -8,6 +9,8 @@ from scipy.stats import chi2
 from matplotlib import pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 
+from .profiling import measure
+
 
 class EmptyCube(object):
     """Empty cube to avoid exceptions being raised"""
@@ -24,9 +27,156 @@ class EmptyCube(object):
         return repr(self.decorated)
 
     def __getattr__(self, name):
+        if name == "decorated":
+            # Not set yet (e.g. while unpickling)
+            raise AttributeError(name)
         return getattr(self.decorated, name)
 
 
+def selected_indices(values, selected):
+    """Indices of the domain `values` (strings) among `selected`"""
+    strings = set()
+    floats = set()
+    for v in selected:
+        strings.add(str(v))
+        try:
+            floats.add(float(v))
+        except (TypeError, ValueError):
+            pass
+    indices = []
+    for i, v in enumerate(values):
+        if v in strings:
+            indices.append(i)
+            continue
+        try:
+            if float(v) in floats:
+                indices.append(i)
+        except (TypeError, ValueError):
+            pass
+    return indices
+
+
+class SelectedCube(object):
+    """
+    View of `cube` restricted to some values of its parameters. Nothing is
+    read from the cube until it is iterated over or numpyfied, and then
+    only the selected sub-cubes are.
+
+    `selections` maps parameters to the selected values, which are matched
+    against the domain values by their string or float value (e.g. 1e-3
+    selects '0.001').
+    """
+    def __init__(self, cube, selections):
+        self.cube = cube
+        domain = cube.domain
+        self.indices = OrderedDict()
+        for parameter, values in selections.items():
+            if parameter not in domain:
+                raise ValueError("Unknown parameter '{}' in cube '{}'"
+                                 "".format(parameter, cube.name))
+            self.indices[parameter] = selected_indices(domain[parameter],
+                                                        values)
+        self._len = None
+
+    @property
+    def domain(self):
+        domain = OrderedDict()
+        for parameter, values in self.cube.domain.items():
+            indices = self.indices.get(parameter)
+            domain[parameter] = values if indices is None else \
+                [values[i] for i in indices]
+        return domain
+
+    def selected(self, parameter, value):
+        indices = self.indices.get(parameter)
+        if indices is None:
+            return True
+        values = self.cube.domain[parameter]
+        return any(values[i] == value for i in indices)
+
+    def _wrap(self, cube):
+        """`cube` (a sub-cube of self.cube) restricted to the selection"""
+        if not hasattr(cube, "domain"):
+            # A value
+            return cube
+        domain = cube.domain
+        selections = OrderedDict()
+        for parameter, indices in self.indices.items():
+            if parameter not in domain:
+                continue
+            values = self.cube.domain[parameter]
+            selected = [values[i] for i in indices]
+            # The parameters fixed by `iter_dimensions` are already reduced
+            if all(v in selected for v in domain[parameter]):
+                continue
+            selections[parameter] = selected
+        if len(selections) == 0:
+            return cube
+        return SelectedCube(cube, selections)
+
+    def iter_dimensions(self, *parameters):
+        for t, cube_i in self.cube.iter_dimensions(*parameters):
+            if all(self.selected(p, v) for p, v in zip(parameters, t)):
+                yield t, self._wrap(cube_i)
+
+    def iter_selected(self):
+        """
+        Yield the sub-cubes of self.cube at each combination of the selected
+        parameters (these sub-cubes are not restricted any further)
+        """
+        parameters = tuple(self.indices.keys())
+        for t, cube_i in self.cube.iter_dimensions(*parameters):
+            if all(self.selected(p, v) for p, v in zip(parameters, t)):
+                yield cube_i
+
+    def __call__(self, *metrics, **parameters):
+        if all(len(values) == 1 for values in self.domain.values()):
+            # Single point: the raw value is returned
+            for cube_i in self.iter_selected():
+                return cube_i(*metrics, **parameters)
+        return self._wrap(self.cube(*metrics, **parameters))
+
+    def numpyfy(self, *args, **kwargs):
+        parameters = list(self.cube.domain.keys())
+        selected = list(self.indices.keys())
+        blocks = []
+        for cube_i in self.iter_selected():
+            block = np.asarray(cube_i.numpyfy(*args, **kwargs))
+            # The selected parameters kept by the sub-cube have one value
+            kept = list(getattr(cube_i, "domain", {}).keys())
+            for axis in sorted((kept.index(p) for p in selected if p in kept),
+                               reverse=True):
+                block = np.take(block, 0, axis=axis)
+            blocks.append(block)
+        shape = tuple(len(self.indices[p]) for p in selected)
+        if len(blocks) > 0 and \
+                all(b.shape == blocks[0].shape for b in blocks):
+            block = np.stack(blocks).reshape(shape + blocks[0].shape)
+        else:
+            # Ragged values
+            block = np.empty(len(blocks), dtype=object)
+            block[:] = [b.tolist() for b in blocks]
+            block = block.reshape(shape)
+        # Back to the order of the domain
+        return np.moveaxis(block, list(range(len(selected))),
+                           [parameters.index(p) for p in selected])
+
+    def __len__(self):
+        if self._len is None:
+            self._len = sum(len(cube_i) for cube_i in self.iter_selected())
+        return self._len
+
+    def __getattr__(self, name):
+        if name == "cube":
+            # Not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.cube, name)
+
+    def __repr__(self):
+        return "{}({}, {})".format(self.__class__.__name__, repr(self.cube),
+                                   dict(self.domain))
+
+
 @contextmanager
 def save_pdf(fname):
     fpath = os.path.realpath("{}.pdf".format(fname))
@@ -54,7 +204,8 @@ class PDFSaver(object):
         if self.fig is not None:
             try:
                 if save:
-                    self.PdfPages.savefig(self.fig)
+                    with measure("save", self):
+                        self.PdfPages.savefig(self.fig)
             finally:
                 plt.close(self.fig)
 
@@ -0,0 +1,49 @@
+"""
+In-memory test doubles of `clustertools.Datacube`
+"""
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+import clustertools
+
+
+class PointsCube(clustertools.Datacube):
+    """
+    Minimal in-memory cube whose sub-cubes keep the fixed parameters (with
+    one value each), as `Datacube.iter_dimensions` does. The combinations
+    absent from `values` are missing.
+    """
+    def __init__(self, domain, values, name="cube"):
+        self.domain = OrderedDict(domain)
+        self.values = values  # parameter values tuple -> loss
+        self.name = name
+
+    @property
+    def metrics(self):
+        return ["loss"]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __call__(self, *metrics):
+        if all(len(vs) == 1 for vs in self.domain.values()):
+            return next(iter(self.values.values()), None)
+        return self
+
+    def iter_dimensions(self, *parameters):
+        names = list(self.domain.keys())
+        for t in itertools.product(*[self.domain[p] for p in parameters]):
+            fixed = dict(zip(parameters, t))
+            domain = OrderedDict((n, [fixed[n]] if n in fixed
+                                  else self.domain[n]) for n in names)
+            values = {k: v for k, v in self.values.items()
+                      if all(k[names.index(p)] == fixed[p]
+                             for p in parameters)}
+            yield t, PointsCube(domain, values, self.name)
+
+    def numpyfy(self, as_float=False):
+        shape = tuple(len(vs) for vs in self.domain.values())
+        return np.array([self.values.get(k, np.nan) for k in
+                         itertools.product(*self.domain.values())],
+                        dtype=float).reshape(shape)
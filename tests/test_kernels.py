@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+
+from clustertools_analytics.kernels import interp_rows, running_median, \
+    lttb, minmax_envelope
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(42)
+
+
+def sorted_rows(rng, n, k):
+    return np.sort(rng.uniform(0, 10, (n, k)), axis=1)
+
+
+@pytest.mark.parametrize("shared_xs", [True, False])
+@pytest.mark.parametrize("shared_ps", [True, False])
+def test_interp_rows_matches_np_interp(rng, shared_xs, shared_ps):
+    n, k, m = 5, 20, 30
+    xss = sorted_rows(rng, 1 if shared_xs else n, k)
+    pss = rng.uniform(-2, 12, (1 if shared_ps else n, m))
+    # Ties between the points and the abscissa
+    pss[:, :3] = xss[:, [0, 7, -1]][:len(pss)]
+    yss = rng.normal(size=(n, k))
+
+    xs = xss[0] if shared_xs else xss
+    ps = pss[0] if shared_ps else pss
+    rss = interp_rows(ps, xs, yss)
+    for i in range(n):
+        expected = np.interp(pss[0 if shared_ps else i],
+                             xss[0 if shared_xs else i], yss[i])
+        np.testing.assert_allclose(rss[i], expected, rtol=1e-12)
+
+
+def test_interp_rows_left_right_period(rng):
+    xs = np.sort(rng.uniform(0, 10, 15))
+    ps = rng.uniform(-5, 15, 40)
+    yss = rng.normal(size=(3, 15))
+
+    rss = interp_rows(ps, xs, yss, left=-1., right=1.)
+    for ys, rs in zip(yss, rss):
+        np.testing.assert_allclose(rs, np.interp(ps, xs, ys, -1., 1.),
+                                   rtol=1e-12)
+
+    rss = interp_rows(ps, xs, yss, period=4.)
+    for ys, rs in zip(yss, rss):
+        np.testing.assert_allclose(rs, np.interp(ps, xs, ys, period=4.),
+                                   rtol=1e-12)
+
+
+def test_interp_rows_dtype(rng):
+    xs = np.linspace(0, 1, 10)
+    yss = rng.normal(size=(2, 10))
+    rss = interp_rows(np.linspace(0, 1, 7), xs, yss, dtype=np.float32)
+    assert rss.dtype == np.float32
+    np.testing.assert_allclose(rss[1], np.interp(np.linspace(0, 1, 7), xs,
+                                                 yss[1]), rtol=1e-6)
+
+
+def reference_running_median(yss, window_size):
+    """Median of the non-NaN values of each reflected window, one by one"""
+    before = window_size // 2
+    after = window_size - 1 - before
+    mss = np.full(yss.shape, np.nan)
+    for i, ys in enumerate(yss):
+        padded = np.pad(ys, (before, after), mode="symmetric")
+        for j in range(len(ys)):
+            window = padded[j:j + window_size]
+            window = np.sort(window[~np.isnan(window)])
+            if len(window) > 0:
+                # The higher middle value for even counts
+                mss[i, j] = window[len(window) // 2]
+    return mss
+
+
+@pytest.mark.parametrize("window_size", [2, 3, 4, 7, 30])
+@pytest.mark.parametrize("max_elements", [2**24, 10])
+def test_running_median_matches_reference(rng, window_size, max_elements):
+    yss = rng.normal(size=(4, 25))
+    yss[rng.random(yss.shape) < .2] = np.nan
+    yss[1, 5:15] = np.nan
+    yss[2] = np.nan
+    mss = running_median(yss, window_size, max_elements=max_elements)
+    np.testing.assert_array_equal(mss,
+                                  reference_running_median(yss, window_size))
+
+
+@pytest.mark.parametrize("window_size", [3, 4, 9])
+def test_running_median_matches_median_filter(rng, window_size):
+    ndimage = pytest.importorskip("scipy.ndimage")
+    yss = rng.normal(size=(3, 40))
+    np.testing.assert_array_equal(
+        running_median(yss, window_size, max_elements=50),
+        ndimage.median_filter(yss, size=(1, window_size), mode="reflect"))
+
+
+def reference_lttb(xs, ys, n_points):
+    """Single series LTTB, with the buckets of `lttb`"""
+    k = len(xs)
+    n_buckets = n_points - 2
+    edges = np.floor(np.linspace(1, k - 1, n_buckets + 1)).astype(int)
+    selected = [0]
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < n_buckets:
+            c_x = xs[edges[b + 1]:edges[b + 2]].mean()
+            c_y = ys[edges[b + 1]:edges[b + 2]].mean()
+        else:
+            c_x, c_y = xs[-1], ys[-1]
+        a_x, a_y = xs[selected[-1]], ys[selected[-1]]
+        areas = [abs((a_x - c_x) * (ys[j] - a_y) - (a_x - xs[j]) * (c_y - a_y))
+                 for j in range(lo, hi)]
+        selected.append(lo + int(np.argmax(areas)))
+    selected.append(k - 1)
+    return np.array(selected)
+
+
+def test_lttb_matches_reference(rng):
+    xs = np.sort(rng.uniform(0, 100, 200))
+    yss = np.cumsum(rng.normal(size=(3, 200)), axis=1)
+    xs_out, yss_out = lttb(xs, yss, 25)
+    assert yss_out.shape == (3, 25)
+    for i, ys in enumerate(yss):
+        selected = reference_lttb(xs, ys, 25)
+        row_xs = xs_out if xs_out.ndim == 1 else xs_out[i]
+        np.testing.assert_array_equal(row_xs, xs[selected])
+        np.testing.assert_array_equal(yss_out[i], ys[selected])
+
+
+def test_minmax_envelope_keeps_bucket_extrema(rng):
+    xs = np.arange(103.)
+    yss = rng.normal(size=(2, 103))
+    yss[0, 10] = np.nan
+    xs_out, yss_out = minmax_envelope(xs, yss, 21)
+    assert xs_out.shape == (20,) and yss_out.shape == (2, 20)
+    np.testing.assert_array_equal(np.nanmax(yss_out, axis=1),
+                                  np.nanmax(yss, axis=1))
+    np.testing.assert_array_equal(np.nanmin(yss_out, axis=1),
+                                  np.nanmin(yss, axis=1))
+    assert xs_out[0] == xs[0] and xs_out[-1] == xs[-1]
+
+
+@pytest.mark.parametrize("downsample, minimum", [(lttb, 3),
+                                                 (minmax_envelope, 2)])
+def test_downsampling_budget(rng, downsample, minimum):
+    xs = np.arange(50.)
+    yss = rng.normal(size=(2, 50))
+    with pytest.raises(ValueError):
+        downsample(xs, yss, minimum - 1)
+    xs_out, yss_out = downsample(xs, yss, minimum)
+    assert yss_out.shape == (2, minimum)
+    assert xs_out[..., 0].min() == xs[0] and xs_out[..., -1].max() == xs[-1]
+    # Series within the budget are left as they are
+    xs_out, yss_out = downsample(xs, yss, 50)
+    np.testing.assert_array_equal(yss_out, yss)
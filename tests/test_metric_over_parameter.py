@@ -0,0 +1,60 @@
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("clustertools")
+
+from clustertools_analytics.accessor import MetricOverParameter, \
+    MissingValuesWarning
+from datacubes import PointsCube
+
+
+@pytest.fixture
+def cube():
+    # ("2", "1") is missing, ("3", "0") is a NaN result
+    domain = OrderedDict([("a", ["1", "2", "3"]),
+                          ("seed", ["0", "1", "2"])])
+    values = {(a, s): float(a) * 10 + float(s)
+              for a, s in itertools.product(*domain.values())}
+    del values["2", "1"]
+    values["3", "0"] = np.nan
+    return PointsCube(domain, values)
+
+
+def per_cell(accessor):
+    accessor.vectorize = False
+    return accessor
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"masked": True},
+                                    {"labelled": True}])
+def test_gather_path_matches_per_cell_path(cube, kwargs):
+    accessor = MetricOverParameter("loss", "a", "seed", **kwargs)
+    assert accessor.access_vectorized(cube) is not None
+
+    with pytest.warns(MissingValuesWarning):
+        gathered = accessor(cube)
+    with pytest.warns(MissingValuesWarning):
+        reference = per_cell(MetricOverParameter("loss", "a", "seed",
+                                                 **kwargs))(cube)
+
+    if kwargs.get("labelled"):
+        assert gathered.dims == reference.dims
+        gathered, reference = gathered.values, reference.values
+    assert type(gathered) is type(reference)
+    assert gathered.dtype == reference.dtype
+    np.testing.assert_array_equal(np.ma.getdata(gathered),
+                                  np.ma.getdata(reference))
+    np.testing.assert_array_equal(np.ma.getmask(gathered),
+                                  np.ma.getmask(reference))
+
+
+def test_gather_path_skips_missing_and_keeps_nans(cube):
+    with pytest.warns(MissingValuesWarning) as record:
+        losses = MetricOverParameter("loss", "a", "seed")(cube)
+    np.testing.assert_array_equal(losses, [10, 11, 12, 20, 22,
+                                           np.nan, 31, 32])
+    [warning] = record
+    assert warning.message.coordinates == [("2", "1")]
@@ -0,0 +1,36 @@
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("clustertools")
+
+from clustertools_analytics.accessor import MetricOverParameter, Select, \
+    gather, select
+from datacubes import PointsCube
+
+
+@pytest.fixture
+def cube():
+    domain = OrderedDict([("a", ["1", "2", "3"]),
+                          ("seed", ["0", "1", "2", "3"])])
+    values = {(a, s): float(a) * 10 + float(s)
+              for a, s in itertools.product(*domain.values())}
+    return PointsCube(domain, values)
+
+
+def test_select_gather_path(cube):
+    assert gather(select(cube, a=[1, 3]), "loss", "a", "seed") is not None
+    losses = Select(MetricOverParameter("loss", "a", "seed"), a=[1, 3])(cube)
+    np.testing.assert_allclose(losses, [10, 11, 12, 13, 30, 31, 32, 33])
+
+
+def test_select_per_cell_path(cube):
+    losses = Select(MetricOverParameter("loss", "a", "seed", aggregator=list),
+                    a=[1, 3])(cube)
+    assert losses == [10, 11, 12, 13, 30, 31, 32, 33]
+
+    losses = Select(MetricOverParameter("loss", "seed", aggregator=list),
+                    a=3, seed=[0, 2])(cube)
+    assert losses == [30, 32]